@@ -1,41 +1,86 @@
-import os
-from dotenv import load_dotenv
-from typing import Dict, Any, Optional
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import Callable, Dict, Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from config import env
 
-load_dotenv()
+# Environment variables (.env) are loaded once by the program entry point
+# before this module is imported.
+
+_ENV_VARS = (
+    "SLACK_BOT_TOKEN",
+    "SLACK_APP_TOKEN",
+    "SLACK_CHANNEL_ID",
+    "NOTION_API_KEY",
+    "NOTION_DATABASE_ID",
+    "GITHUB_TOKEN",
+    "GITHUB_REPO_OWNER",
+    "GITHUB_REPO_NAME",
+    "GOOGLE_CALENDAR_CREDENTIALS_PATH",
+    "GOOGLE_CALENDAR_TOKEN_PATH",
+    "GOOGLE_API_KEY",
+)
+
+# Snapshot of the configuration environment variables
+_ENV: Dict[str, Optional[str]] = {}
+
+def _load_env(environ: Dict[str, str]) -> None:
+    """Populate the snapshot from an environment mapping"""
+    _ENV.clear()
+    _ENV.update({name: environ.get(name) for name in _ENV_VARS})
+
+def refresh_env() -> None:
+    """Re-read the configuration environment variables into the snapshot"""
+    _load_env(env.refresh())
+
+def _env(name: str) -> Callable[[], Optional[str]]:
+    """Default factory returning an environment variable from the snapshot"""
+    return lambda: _ENV[name]
+
+_load_env(env.snapshot())
 
 class SlackConfig(BaseModel):
     """Configuration for Slack integration"""
-    bot_token: Optional[str] = Field(default=os.getenv("SLACK_BOT_TOKEN"))
-    app_token: Optional[str] = Field(default=os.getenv("SLACK_APP_TOKEN"))
-    channel_id: Optional[str] = Field(default=os.getenv("SLACK_CHANNEL_ID"))
+    model_config = ConfigDict(defer_build=True)
+
+    bot_token: Optional[str] = Field(default_factory=_env("SLACK_BOT_TOKEN"))
+    app_token: Optional[str] = Field(default_factory=_env("SLACK_APP_TOKEN"))
+    channel_id: Optional[str] = Field(default_factory=_env("SLACK_CHANNEL_ID"))
 
 class NotionConfig(BaseModel):
     """Configuration for Notion integration"""
-    api_key: Optional[str] = Field(default=os.getenv("NOTION_API_KEY"))
-    database_id: Optional[str] = Field(default=os.getenv("NOTION_DATABASE_ID"))
+    model_config = ConfigDict(defer_build=True)
+
+    api_key: Optional[str] = Field(default_factory=_env("NOTION_API_KEY"))
+    database_id: Optional[str] = Field(default_factory=_env("NOTION_DATABASE_ID"))
 
 class GitHubConfig(BaseModel):
     """Configuration for GitHub integration"""
-    token: Optional[str] = Field(default=os.getenv("GITHUB_TOKEN"))
-    repo_owner: Optional[str] = Field(default=os.getenv("GITHUB_REPO_OWNER"))
-    repo_name: Optional[str] = Field(default=os.getenv("GITHUB_REPO_NAME"))
+    model_config = ConfigDict(defer_build=True)
+
+    token: Optional[str] = Field(default_factory=_env("GITHUB_TOKEN"))
+    repo_owner: Optional[str] = Field(default_factory=_env("GITHUB_REPO_OWNER"))
+    repo_name: Optional[str] = Field(default_factory=_env("GITHUB_REPO_NAME"))
 
 class GoogleCalendarConfig(BaseModel):
     """Configuration for Google Calendar integration"""
-    credentials_path: Optional[str] = Field(default=os.getenv("GOOGLE_CALENDAR_CREDENTIALS_PATH"))
-    token_path: Optional[str] = Field(default=os.getenv("GOOGLE_CALENDAR_TOKEN_PATH"))
+    model_config = ConfigDict(defer_build=True)
+
+    credentials_path: Optional[str] = Field(default_factory=_env("GOOGLE_CALENDAR_CREDENTIALS_PATH"))
+    token_path: Optional[str] = Field(default_factory=_env("GOOGLE_CALENDAR_TOKEN_PATH"))
 
 class LLMConfig(BaseModel):
     """Configuration for LLM providers"""
+    model_config = ConfigDict(defer_build=True)
+
     provider: str = Field(default="google")
     model: str = Field(default="google/gemini-2.0-flash")
-    api_key: Optional[str] = Field(default=os.getenv("GOOGLE_API_KEY"))
+    api_key: Optional[str] = Field(default_factory=_env("GOOGLE_API_KEY"))
     temperature: float = Field(default=0.1)
 
 class AppConfig(BaseModel):
     """Main application configuration"""
+    model_config = ConfigDict(defer_build=True)
+
     slack: SlackConfig = Field(default_factory=SlackConfig)
     notion: NotionConfig = Field(default_factory=NotionConfig)
     github: GitHubConfig = Field(default_factory=GitHubConfig)
@@ -44,14 +89,19 @@ class AppConfig(BaseModel):
     debug: bool = Field(default=False)
     log_level: str = Field(default="INFO")
 
-# Global configuration instance
-config = AppConfig()
+# Global configuration instance, created on first use
+config: Optional[AppConfig] = None
 
+@lru_cache(maxsize=1)
 def get_config() -> AppConfig:
     """Get the application configuration"""
+    global config
+    if config is None:
+        config = AppConfig()
     return config
 
 def update_config(new_config: Dict[str, Any]) -> None:
     """Update the configuration with new values"""
     global config
+    get_config.cache_clear()
     config = AppConfig(**new_config)
@@ -0,0 +1,21 @@
+"""
+Process environment snapshot shared by the entry point and the configuration
+"""
+
+import os
+from typing import Dict, Optional
+
+_snapshot: Optional[Dict[str, str]] = None
+
+def snapshot() -> Dict[str, str]:
+    """Get a copy of the process environment, taken on first call"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = dict(os.environ)
+    return _snapshot
+
+def refresh() -> Dict[str, str]:
+    """Retake the environment snapshot (e.g. after the environment changed)"""
+    global _snapshot
+    _snapshot = None
+    return snapshot()
@@ -0,0 +1,35 @@
+"""
+Shared HTTP connection pools for the integrations
+Keeps keep-alive connections (and their TLS sessions) open across calls
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connections kept open per host
+POOL_SIZE = 20
+
+def _build_session() -> requests.Session:
+    """Build a pooled session that retries idempotent requests on transient errors"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        max_retries=Retry(total=5, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+    )
+    session.mount("https://", adapter)
+    return session
+
+# Shared by all direct (non-SDK) HTTP calls. Credentials are passed per request,
+# never stored on the session, since it talks to several services.
+shared_session = _build_session()
+
+def build_httpx_client():
+    """Build a pooled httpx client (used by the Notion SDK) with connection retries"""
+    import httpx
+    
+    return httpx.Client(
+        transport=httpx.HTTPTransport(retries=3),
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+    )
@@ -1,8 +1,64 @@
 import os
+import re
+import string
 import logging
-from typing import List, Dict, Any, Optional
-from github import Github, GithubException
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import requests
 from config.config import get_config
+from integrations._http import POOL_SIZE, shared_session
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+
+# Number of aliased createIssue mutations sent per GraphQL request
+GRAPHQL_BATCH_SIZE = 20
+
+# Maximum concurrent REST requests when falling back from GraphQL
+REST_MAX_WORKERS = 8
+
+# Title keywords used to derive type labels, matched in a single scan
+_LABEL_RX = re.compile(
+    r"\b(?P<frontend>ui|interface|design)\b"
+    r"|\b(?P<backend>api|integration|backend)\b"
+    r"|\b(?P<mobile>mobile|app)\b",
+    re.IGNORECASE
+)
+_TYPE_LABELS = ("frontend", "backend", "mobile")
+
+_PRIORITY_LABEL = {
+    "critical": "priority: critical",
+    "high": "priority: high",
+    "medium": "priority: medium",
+}
+
+_ISSUE_BODY_TMPL = string.Template("""## Feature Description
+$description
+
+## Priority: $priority
+**Impact Score:** $impact_score
+**Sentiment:** $sentiment
+
+## Technical Details
+**Estimated Effort:** $estimated_effort
+**Business Value:** $business_value
+**Target Release:** $target_release
+
+## Dependencies
+$dependencies
+
+## Acceptance Criteria
+- [ ] Functionality works as described
+- [ ] Performance meets requirements
+- [ ] UI/UX meets design standards
+- [ ] Documentation is complete
+- [ ] Testing coverage is adequate
+
+## Additional Context
+This feature was automatically generated from user feedback analysis.
+""")
 
 class GitHubIntegration:
     """GitHub integration for creating issues and managing repositories"""
@@ -12,13 +68,21 @@ class GitHubIntegration:
         self.logger = logging.getLogger(__name__)
         self.client = None
         self.repo = None
+        # Per-page ETag cache for get_open_issues: url -> (etag, issues, next_url)
+        self._issues_pages: Dict[str, Tuple[str, List[Dict[str, Any]], Optional[str]]] = {}
+        self._repo_node_id = None
+        self._label_id_map: Optional[Dict[str, str]] = None
+        # Labels that could not be created, so they aren't retried for every issue
+        self._unavailable_labels = set()
         self.initialize_github()
     
     def initialize_github(self):
         """Initialize GitHub client with authentication"""
+        from github import Github, GithubException
+        
         try:
             if self.config.github.token:
-                self.client = Github(self.config.github.token)
+                self.client = Github(self.config.github.token, per_page=100, pool_size=POOL_SIZE)
                 self.logger.info("GitHub client initialized successfully")
                 
                 # Get repository
@@ -42,6 +106,8 @@ class GitHubIntegration:
             self.logger.error("GitHub repository not initialized")
             return None
         
+        from github import GithubException
+        
         try:
             # Create issue
             issue = self.repo.create_issue(
@@ -71,56 +137,230 @@ class GitHubIntegration:
     
     def create_issues_from_features(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create GitHub issues from feature requests"""
-        created_issues = []
+        return [issue for _, issue in self.iter_create_issues_from_features(features) if issue]
+    
+    def iter_create_issues_from_features(
+        self, features: Iterable[Dict[str, Any]]
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Create GitHub issues from feature requests, yielding (feature, issue) pairs
         
-        for feature in features:
-            issue_title = f"Feature: {feature.get('title', 'Unknown Feature')}"
-            
-            # Build issue body with feature details
-            issue_body = self._build_issue_body(feature)
+        Issues are created through batched GraphQL mutations (one HTTP request per
+        GRAPHQL_BATCH_SIZE features). A batch falls back to the REST API if the
+        GraphQL request fails. Only one batch of features is held at a time, so
+        callers can push each issue downstream as soon as it exists.
+        """
+        if not self.repo:
+            self.logger.error("GitHub repository not initialized")
+            return
+        
+        features = iter(features)
+        while True:
+            batch = list(islice(features, GRAPHQL_BATCH_SIZE))
+            if not batch:
+                break
             
-            # Determine labels based on priority and type
-            labels = self._determine_issue_labels(feature)
+            payloads = []
+            for feature in batch:
+                payloads.append({
+                    'title': f"Feature: {feature.get('title', 'Unknown Feature')}",
+                    # Build issue body with feature details
+                    'body': self._build_issue_body(feature),
+                    # Determine labels based on priority and type
+                    'labels': self._determine_issue_labels(feature)
+                })
             
-            # Create the issue
-            issue = self.create_issue(issue_title, issue_body, labels)
+            issues = self._create_issues_graphql(payloads)
+            if issues is None:
+                self.logger.warning("GraphQL issue batch failed, falling back to REST API")
+                issues = self._create_issues_rest(payloads)
+            else:
+                # Only the issues GraphQL didn't create go through REST, so the
+                # ones that did succeed aren't created twice
+                retry = [i for i, issue in enumerate(issues) if issue is None]
+                if retry:
+                    self.logger.warning(f"{len(retry)} of {len(payloads)} issues not created through GraphQL, retrying them through the REST API")
+                    for i, issue in zip(retry, self._create_issues_rest([payloads[i] for i in retry])):
+                        issues[i] = issue
             
-            if issue:
-                created_issues.append(issue)
-                # Add the issue URL to the feature data
-                feature['github_issue_url'] = issue['url']
-                feature['github_issue_number'] = issue['number']
+            for feature, issue in zip(batch, issues):
+                if issue:
+                    # Add the issue URL to the feature data
+                    feature['github_issue_url'] = issue['url']
+                    feature['github_issue_number'] = issue['number']
+                yield feature, issue
+    
+    def _create_issues_rest(self, payloads: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Create issues through the REST API concurrently, preserving input order"""
+        if len(payloads) <= 1:
+            return [self.create_issue(p['title'], p['body'], p['labels']) for p in payloads]
+        
+        with ThreadPoolExecutor(max_workers=min(REST_MAX_WORKERS, len(payloads))) as executor:
+            return list(executor.map(
+                lambda p: self.create_issue(p['title'], p['body'], p['labels']),
+                payloads
+            ))
+    
+    def _api_headers(self) -> Dict[str, str]:
+        """Headers for direct GitHub API requests"""
+        return {
+            'Authorization': f"bearer {self.config.github.token}",
+            'Accept': 'application/vnd.github+json'
+        }
+    
+    def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Run a GitHub GraphQL request, returning the data payload or None on error
+        
+        A response with both errors and data is a partial success (e.g. one of
+        several aliased mutations rejected); its data is returned, with the failed
+        fields set to null.
+        """
+        try:
+            response = shared_session.post(
+                GITHUB_GRAPHQL_URL,
+                headers=self._api_headers(),
+                json={'query': query, 'variables': variables or {}},
+                timeout=30
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.logger.error(f"GitHub GraphQL request failed: {e}")
+            return None
         
-        return created_issues
+        if payload.get('errors'):
+            self.logger.error(f"GitHub GraphQL errors: {payload['errors']}")
+        return payload.get('data') or None
+    
+    def _load_label_ids(self) -> Optional[Dict[str, str]]:
+        """Fetch every repository label as a name -> GraphQL node ID map, or None on error"""
+        label_ids = {}
+        cursor = None
+        while True:
+            data = self._graphql(
+                """query($owner: String!, $name: String!, $cursor: String) {
+                    repository(owner: $owner, name: $name) {
+                        labels(first: 100, after: $cursor) {
+                            nodes { id name }
+                            pageInfo { hasNextPage endCursor }
+                        }
+                    }
+                }""",
+                {'owner': self.config.github.repo_owner, 'name': self.config.github.repo_name, 'cursor': cursor}
+            )
+            if not data or not data.get('repository'):
+                return None
+            labels = data['repository']['labels']
+            label_ids.update((node['name'], node['id']) for node in labels['nodes'])
+            if not labels['pageInfo']['hasNextPage']:
+                return label_ids
+            cursor = labels['pageInfo']['endCursor']
+    
+    def _create_label(self, name: str) -> Optional[str]:
+        """Create a repository label, returning its GraphQL node ID or None on error"""
+        try:
+            response = shared_session.post(
+                f"{GITHUB_API_URL}/repos/{self.repo.full_name}/labels",
+                headers=self._api_headers(),
+                json={'name': name, 'color': 'ededed'},
+                timeout=30
+            )
+            response.raise_for_status()
+            self.logger.info(f"Created GitHub label: {name}")
+            return response.json()['node_id']
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.logger.warning(f"Could not create GitHub label '{name}': {e}")
+            return None
+    
+    def _get_label_ids(self, labels: List[str]) -> Optional[List[str]]:
+        """Resolve label names to GraphQL node IDs, creating labels the repository lacks
+        
+        Returns None if a label can't be created; such issues go through REST instead.
+        """
+        for label in labels:
+            if label not in self._label_id_map and label not in self._unavailable_labels:
+                node_id = self._create_label(label)
+                if node_id:
+                    self._label_id_map[label] = node_id
+                else:
+                    self._unavailable_labels.add(label)
+        
+        if any(label in self._unavailable_labels for label in labels):
+            return None
+        return [self._label_id_map[label] for label in labels]
+    
+    def _create_issues_graphql(self, payloads: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """Create several issues with a single aliased GraphQL mutation"""
+        if not payloads:
+            return []
+        
+        if self._repo_node_id is None:
+            self._repo_node_id = self.repo.node_id
+        
+        if self._label_id_map is None:
+            label_ids = self._load_label_ids()
+            if label_ids is None:
+                # Label IDs are required for GraphQL; REST takes label names
+                self.logger.warning("Could not load repository labels")
+                return None
+            self._label_id_map = label_ids
+        
+        declarations = []
+        mutations = []
+        variables = {}
+        for i, payload in enumerate(payloads):
+            label_ids = self._get_label_ids(payload['labels'])
+            if label_ids is None:
+                # Left out of the mutation; reported as not created, so it's sent through REST
+                continue
+            declarations.append(f"$i{i}: CreateIssueInput!")
+            mutations.append(
+                f"i{i}: createIssue(input: $i{i}) "
+                "{ issue { databaseId number title url state createdAt } }"
+            )
+            variables[f"i{i}"] = {
+                'repositoryId': self._repo_node_id,
+                'title': payload['title'],
+                'body': payload['body'],
+                'labelIds': label_ids
+            }
+        
+        if not mutations:
+            return [None] * len(payloads)
+        
+        query = f"mutation({', '.join(declarations)}) {{ {' '.join(mutations)} }}"
+        data = self._graphql(query, variables)
+        if data is None:
+            return None
+        
+        issues = []
+        for i in range(len(payloads)):
+            issue = (data.get(f"i{i}") or {}).get('issue')
+            if not issue:
+                issues.append(None)
+                continue
+            self.logger.info(f"Created GitHub issue: {issue['title']} (#{issue['number']})")
+            issues.append({
+                "id": issue['databaseId'],
+                "number": issue['number'],
+                "title": issue['title'],
+                "url": issue['url'],
+                "state": issue['state'].lower(),
+                "created_at": issue['createdAt']
+            })
+        return issues
     
     def _build_issue_body(self, feature: Dict[str, Any]) -> str:
         """Build a detailed issue body from feature data"""
-        body = f"""## Feature Description
-{feature.get('description', 'No description provided')}
-
-## Priority: {feature.get('priority', 'Medium')}
-**Impact Score:** {feature.get('impact_score', 0)}
-**Sentiment:** {feature.get('sentiment', 'neutral')}
-
-## Technical Details
-**Estimated Effort:** {feature.get('estimated_effort', 'Not estimated')}
-**Business Value:** {feature.get('business_value', 'Not estimated')}
-**Target Release:** {feature.get('target_release', 'Not scheduled')}
-
-## Dependencies
-{', '.join(feature.get('dependencies', ['None']))}
-
-## Acceptance Criteria
-- [ ] Functionality works as described
-- [ ] Performance meets requirements
-- [ ] UI/UX meets design standards
-- [ ] Documentation is complete
-- [ ] Testing coverage is adequate
-
-## Additional Context
-This feature was automatically generated from user feedback analysis.
-"""
-        return body
+        return _ISSUE_BODY_TMPL.substitute(
+            description=feature.get('description', 'No description provided'),
+            priority=feature.get('priority', 'Medium'),
+            impact_score=feature.get('impact_score', 0),
+            sentiment=feature.get('sentiment', 'neutral'),
+            estimated_effort=feature.get('estimated_effort', 'Not estimated'),
+            business_value=feature.get('business_value', 'Not estimated'),
+            target_release=feature.get('target_release', 'Not scheduled'),
+            dependencies=', '.join(feature.get('dependencies') or ['None'])
+        )
     
     def _determine_issue_labels(self, feature: Dict[str, Any]) -> List[str]:
         """Determine appropriate labels for the issue"""
@@ -128,23 +368,11 @@ This feature was automatically generated from user feedback analysis.
         
         # Add priority-based labels
         priority = feature.get('priority', '').lower()
-        if priority == 'critical':
-            labels.append('priority: critical')
-        elif priority == 'high':
-            labels.append('priority: high')
-        elif priority == 'medium':
-            labels.append('priority: medium')
-        else:
-            labels.append('priority: low')
+        labels.append(_PRIORITY_LABEL.get(priority, 'priority: low'))
         
         # Add type-based labels
-        title = feature.get('title', '').lower()
-        if any(word in title for word in ['ui', 'interface', 'design']):
-            labels.append('frontend')
-        if any(word in title for word in ['api', 'integration', 'backend']):
-            labels.append('backend')
-        if any(word in title for word in ['mobile', 'app']):
-            labels.append('mobile')
+        found = {match.lastgroup for match in _LABEL_RX.finditer(feature.get('title', ''))}
+        labels.extend(label for label in _TYPE_LABELS if label in found)
         
         return labels
     
@@ -154,6 +382,8 @@ This feature was automatically generated from user feedback analysis.
             self.logger.error("GitHub repository not initialized")
             return False
         
+        from github import GithubException
+        
         try:
             issue = self.repo.get_issue(issue_number)
             
@@ -180,20 +410,51 @@ This feature was automatically generated from user feedback analysis.
             self.logger.error("GitHub repository not initialized")
             return []
         
+        # Pages are requested with If-None-Match; unchanged pages come back as
+        # 304 Not Modified (which does not count against the rate limit) and are
+        # served from the cache.
+        open_issues = []
+        url = f"{GITHUB_API_URL}/repos/{self.repo.full_name}/issues"
+        params = {'state': 'open', 'per_page': 100}
+        
         try:
-            issues = self.repo.get_issues(state='open')
-            return [
-                {
-                    'number': issue.number,
-                    'title': issue.title,
-                    'url': issue.html_url,
-                    'state': issue.state,
-                    'created_at': issue.created_at.isoformat(),
-                    'labels': [label.name for label in issue.labels]
-                }
-                for issue in issues
-            ]
+            while url:
+                cached = self._issues_pages.get(url)
+                headers = self._api_headers()
+                if cached:
+                    headers['If-None-Match'] = cached[0]
+                
+                response = shared_session.get(url, params=params, headers=headers, timeout=30)
+                if response.status_code == 304 and cached:
+                    _, page_issues, next_url = cached
+                else:
+                    response.raise_for_status()
+                    page_issues = [
+                        {
+                            'number': item['number'],
+                            'title': item['title'],
+                            'url': item['html_url'],
+                            'state': item['state'],
+                            # Same '+00:00' form as PyGithub's datetime.isoformat(), not GitHub's 'Z'
+                            'created_at': datetime.fromisoformat(item['created_at'].replace('Z', '+00:00')).isoformat(),
+                            'labels': [label['name'] for label in item['labels']]
+                        }
+                        for item in response.json()
+                        # The issues endpoint also lists pull requests
+                        if 'pull_request' not in item
+                    ]
+                    next_url = response.links.get('next', {}).get('url')
+                    etag = response.headers.get('ETag')
+                    if etag:
+                        self._issues_pages[url] = (etag, page_issues, next_url)
+                
+                open_issues.extend(page_issues)
+                url = next_url
+                # The "next" link already carries the query string
+                params = None
             
-        except GithubException as e:
+            return open_issues
+            
+        except (requests.RequestException, ValueError) as e:
             self.logger.error(f"Failed to get open issues: {e}")
             return []
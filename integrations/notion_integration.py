@@ -3,37 +3,80 @@ Notion Integration for PM Agent Workflow
 Handles creating and updating PRD documents in Notion
 """
 
-import os
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from notion_client import Client
-from notion_client.errors import APIResponseError
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from config.config import get_config
+from integrations._http import build_httpx_client
 
 logger = logging.getLogger(__name__)
 
+# Notion limits: characters per rich text object, child blocks per append request
+NOTION_MAX_TEXT_LENGTH = 2000
+NOTION_MAX_BLOCKS_PER_REQUEST = 100
+
+# Concurrent requests recommended by Notion's rate limits
+NOTION_MAX_CONCURRENCY = 5
+
+def _paragraph_block(text: str) -> Dict[str, Any]:
+    """Build a Notion paragraph block containing plain text"""
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {
+                        "content": text
+                    }
+                }
+            ]
+        }
+    }
+
+def _paragraph_blocks(content: str) -> Iterator[Dict[str, Any]]:
+    """Yield paragraph blocks for content split into Notion-sized chunks"""
+    for i in range(0, len(content), NOTION_MAX_TEXT_LENGTH):
+        yield _paragraph_block(content[i:i + NOTION_MAX_TEXT_LENGTH])
+
+def _paragraph_block_batches(content: str) -> Iterator[List[Dict[str, Any]]]:
+    """Yield lists of paragraph blocks small enough for one append request"""
+    blocks = _paragraph_blocks(content)
+    while True:
+        batch = list(islice(blocks, NOTION_MAX_BLOCKS_PER_REQUEST))
+        if not batch:
+            return
+        yield batch
+
 class NotionIntegration:
     """Notion integration for creating and updating PRD documents"""
     
     def __init__(self):
         self.client = None
         self.database_id = None
+        self._db_schema: Optional[Dict[str, Any]] = None
+        self._prop_map: Dict[str, str] = {}
+        self._status_type: Optional[str] = None
+        self._status_options: List[Dict[str, Any]] = []
         self.initialize_notion()
     
     def initialize_notion(self):
         """Initialize Notion client with API key"""
         try:
-            # Load environment variables on demand
-            from dotenv import load_dotenv
-            load_dotenv()
+            from notion_client import Client
             
-            notion_api_key = os.getenv('NOTION_API_KEY')
-            database_id = os.getenv('NOTION_DATABASE_ID')
+            config = get_config()
+            notion_api_key = config.notion.api_key
+            database_id = config.notion.database_id
             
             if not notion_api_key or not database_id:
                 logger.warning("Notion API key or database ID not configured")
                 return
             
-            self.client = Client(auth=notion_api_key)
+            self.client = Client(auth=notion_api_key, client=build_httpx_client())
             self.database_id = database_id
             logger.info("✅ Notion client initialized successfully")
             
@@ -46,66 +89,13 @@ class NotionIntegration:
             logger.error("Notion client not initialized")
             return None
         
+        from notion_client.errors import APIResponseError
+        
         try:
-            # First, let's check the database schema to understand the available properties
-            database = self.client.databases.retrieve(self.database_id)
-            logger.info(f"Database properties: {list(database['properties'].keys())}")
+            # The database schema is fetched once and cached
+            self._ensure_schema()
             
-            # Prepare the page properties based on common Notion database schemas
-            properties = {}
-            
-            # Try different common property names for title
-            title_property = self._find_title_property(database)
-            if title_property:
-                properties[title_property] = {
-                    "title": [
-                        {
-                            "text": {
-                                "content": prd_data.get('title', 'Untitled PRD')
-                            }
-                        }
-                    ]
-                }
-            
-            # Try different common property names for status
-            status_property = self._find_status_property(database)
-            if status_property:
-                prop_data = database['properties'][status_property]
-                if prop_data['type'] == 'status':
-                    # Get available status options
-                    status_options = prop_data.get('status', {}).get('options', [])
-                    if status_options:
-                        # Use the first available status option
-                        first_status = status_options[0]['name']
-                        properties[status_property] = {
-                            "status": {
-                                "name": first_status
-                            }
-                        }
-                    else:
-                        logger.warning("No status options found, skipping status property")
-                elif prop_data['type'] == 'select':
-                    # Get available select options
-                    select_options = prop_data.get('select', {}).get('options', [])
-                    if select_options:
-                        # Use the first available select option
-                        first_option = select_options[0]['name']
-                        properties[status_property] = {
-                            "select": {
-                                "name": first_option
-                            }
-                        }
-                    else:
-                        logger.warning("No select options found, skipping status property")
-            
-            # Try different common property names for priority
-            priority_property = self._find_priority_property(database)
-            if priority_property:
-                properties[priority_property] = {
-                    "select": {
-                        "name": prd_data.get('priority', 'Medium')
-                    }
-                }
+            properties = self._build_page_properties(prd_data)
             
             # Create the page
             page = self.client.pages.create(
@@ -118,33 +108,102 @@ class NotionIntegration:
             
         except APIResponseError as e:
             logger.error(f"Notion API error: {str(e)}")
+            if e.code in ('object_not_found', 'validation_error'):
+                # The database may have changed; re-fetch the schema next time
+                self.refresh_schema()
             return None
         except Exception as e:
             logger.error(f"Error creating Notion page: {str(e)}")
             return None
     
-    def _find_title_property(self, database: Dict) -> Optional[str]:
-        """Find the title property in the database"""
-        for prop_name, prop_data in database['properties'].items():
-            if prop_data['type'] == 'title':
-                return prop_name
-        return "Name"  # Fallback to common default
+    def _build_page_properties(self, prd_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build page properties for a PRD from the cached database schema"""
+        # Prepare the page properties based on common Notion database schemas
+        properties = {}
+        
+        # Try different common property names for title
+        title_property = self._prop_map.get('title')
+        if title_property:
+            properties[title_property] = {
+                "title": [
+                    {
+                        "text": {
+                            "content": prd_data.get('title', 'Untitled PRD')
+                        }
+                    }
+                ]
+            }
+        
+        # Try different common property names for status
+        status_property = self._prop_map.get('status')
+        if status_property and self._status_type:
+            if self._status_options:
+                # Use the first available status/select option
+                properties[status_property] = {
+                    self._status_type: {
+                        "name": self._status_options[0]['name']
+                    }
+                }
+            else:
+                logger.warning(f"No {self._status_type} options found, skipping status property")
+        
+        # Try different common property names for priority
+        priority_property = self._prop_map.get('priority')
+        if priority_property:
+            properties[priority_property] = {
+                "select": {
+                    "name": prd_data.get('priority', 'Medium')
+                }
+            }
+        
+        return properties
     
-    def _find_status_property(self, database: Dict) -> Optional[str]:
-        """Find the status property in the database"""
-        for prop_name, prop_data in database['properties'].items():
-            if prop_data['type'] == 'select' and 'status' in prop_name.lower():
-                return prop_name
-            elif prop_data['type'] == 'status':
-                return prop_name
-        return "Status"  # Fallback to common default
+    def _ensure_schema(self) -> None:
+        """Retrieve the database schema once and precompute the property lookups"""
+        if self._db_schema is not None:
+            return
+        
+        database = self.client.databases.retrieve(self.database_id)
+        logger.debug("Database properties: %s", database['properties'].keys())
+        
+        self._prop_map = self._classify_properties(database)
+        
+        status_data = database['properties'].get(self._prop_map['status'])
+        if status_data and status_data['type'] in ('status', 'select'):
+            self._status_type = status_data['type']
+            self._status_options = status_data.get(self._status_type, {}).get('options', [])
+        else:
+            self._status_type = None
+            self._status_options = []
+        
+        self._db_schema = database
     
-    def _find_priority_property(self, database: Dict) -> Optional[str]:
-        """Find the priority property in the database"""
+    def refresh_schema(self) -> None:
+        """Drop the cached database schema so it is fetched again on next use"""
+        self._db_schema = None
+        self._prop_map = {}
+        self._status_type = None
+        self._status_options = []
+    
+    def _classify_properties(self, database: Dict) -> Dict[str, str]:
+        """Find the title, status and priority properties in a single pass over the schema"""
+        found: Dict[str, str] = {}
         for prop_name, prop_data in database['properties'].items():
-            if prop_data['type'] == 'select' and 'priority' in prop_name.lower():
-                return prop_name
-        return "Priority"  # Fallback to common default
+            prop_type = prop_data['type']
+            name_lower = prop_name.lower()
+            if prop_type == 'title':
+                found.setdefault('title', prop_name)
+            elif prop_type == 'status' or (prop_type == 'select' and 'status' in name_lower):
+                found.setdefault('status', prop_name)
+            elif prop_type == 'select' and 'priority' in name_lower:
+                found.setdefault('priority', prop_name)
+        
+        # Fallback to common defaults
+        return {
+            'title': found.get('title', "Name"),
+            'status': found.get('status', "Status"),
+            'priority': found.get('priority', "Priority")
+        }
     
     def update_prd_content(self, page_id: str, prd_content: str) -> bool:
         """Update PRD page content with the generated PRD"""
@@ -152,34 +211,15 @@ class NotionIntegration:
             logger.error("Notion client not initialized")
             return False
         
+        from notion_client.errors import APIResponseError
+        
         try:
-            # Split PRD content into chunks of 2000 characters or less
-            max_length = 2000
-            chunks = [prd_content[i:i + max_length] for i in range(0, len(prd_content), max_length)]
-            
-            # Add PRD content as blocks
-            blocks = []
-            for chunk in chunks:
-                blocks.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": chunk
-                                }
-                            }
-                        ]
-                    }
-                })
-            
-            # Append the content to the page
-            self.client.blocks.children.append(
-                block_id=page_id,
-                children=blocks
-            )
+            # Append the content in requests of at most NOTION_MAX_BLOCKS_PER_REQUEST blocks
+            for batch in _paragraph_block_batches(prd_content):
+                self.client.blocks.children.append(
+                    block_id=page_id,
+                    children=batch
+                )
             
             logger.info(f"✅ PRD content added to Notion page: {page_id}")
             return True
@@ -200,12 +240,72 @@ class NotionIntegration:
                 return page_id
         return None
 
-# Global instance
-notion_integration = NotionIntegration()
+class AsyncNotionIntegration:
+    """Async Notion integration for creating many PRD documents concurrently"""
+    
+    def __init__(self, notion: Optional[NotionIntegration] = None):
+        # The sync integration provides configuration and the cached database schema
+        self.notion = notion or get_notion_integration()
+    
+    async def create_complete_prd(self, client: Any, prd_data: Dict[str, Any], prd_content: str) -> Optional[str]:
+        """Create a complete PRD with both properties and content using an async client"""
+        from notion_client.errors import APIResponseError
+        
+        try:
+            page = await client.pages.create(
+                parent={"database_id": self.notion.database_id},
+                properties=self.notion._build_page_properties(prd_data)
+            )
+            page_id = page['id']
+            
+            for batch in _paragraph_block_batches(prd_content):
+                await client.blocks.children.append(
+                    block_id=page_id,
+                    children=batch
+                )
+            
+            logger.info(f"✅ PRD created in Notion: {page_id}")
+            return page_id
+            
+        except APIResponseError as e:
+            logger.error(f"Notion API error: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error creating Notion PRD: {str(e)}")
+            return None
+    
+    def create_many(self, items: List[Tuple[Dict[str, Any], str]]) -> List[Optional[str]]:
+        """Create several PRDs concurrently, returning page IDs in input order"""
+        if not self.notion.client or not self.notion.database_id:
+            logger.error("Notion client not initialized")
+            return [None] * len(items)
+        
+        try:
+            # Fetch the schema once, before fanning out
+            self.notion._ensure_schema()
+        except Exception as e:
+            logger.error(f"Error retrieving Notion database schema: {str(e)}")
+            return [None] * len(items)
+        
+        return asyncio.run(self._acreate_many(items))
+    
+    async def _acreate_many(self, items: List[Tuple[Dict[str, Any], str]]) -> List[Optional[str]]:
+        """Create PRDs under a bounded concurrency limit"""
+        from notion_client import AsyncClient
+        
+        semaphore = asyncio.Semaphore(NOTION_MAX_CONCURRENCY)
+        
+        async with AsyncClient(auth=get_config().notion.api_key) as client:
+            async def create(prd_data: Dict[str, Any], prd_content: str) -> Optional[str]:
+                async with semaphore:
+                    return await self.create_complete_prd(client, prd_data, prd_content)
+            
+            return await asyncio.gather(*(create(prd_data, content) for prd_data, content in items))
 
+@lru_cache(maxsize=1)
 def get_notion_integration() -> NotionIntegration:
-    """Get the Notion integration instance"""
-    return notion_integration
+    """Get the Notion integration instance (created on first use)"""
+    return NotionIntegration()
 
 def create_prd_in_notion(title: str, content: str, priority: str = "Medium") -> Optional[str]:
     """Convenience function to create a PRD in Notion"""
@@ -213,4 +313,12 @@ def create_prd_in_notion(title: str, content: str, priority: str = "Medium") ->
         "title": title,
         "priority": priority
     }
-    return notion_integration.create_complete_prd(prd_data, content)
+    return get_notion_integration().create_complete_prd(prd_data, content)
+
+async def acreate_prd_in_notion(title: str, content: str, priority: str = "Medium") -> Optional[str]:
+    """Async variant of create_prd_in_notion
+    
+    Runs on the shared pooled client in a worker thread; an async client kept at
+    module level would be tied to the first event loop that used it.
+    """
+    return await asyncio.to_thread(create_prd_in_notion, title, content, priority)
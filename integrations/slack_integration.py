@@ -1,30 +1,47 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
 from config.config import get_config
 
+# Maximum concurrent Slack requests when fetching several channels
+SLACK_MAX_WORKERS = 8
+
+# Largest page conversations.history returns
+SLACK_HISTORY_PAGE_SIZE = 1000
+
 class SlackIntegration:
     """Slack integration for fetching feature requests"""
     
     def __init__(self):
         self.config = get_config()
         self.logger = logging.getLogger(__name__)
+        self._channel_id_cache: Dict[str, str] = {}
+        self._channels_loaded = False
+        # Latest message ts seen per channel ID, for incremental fetches
+        self._last_ts_per_channel: Dict[str, str] = {}
         
         # Initialize Slack client
         if self.config.slack.bot_token:
+            from slack_sdk import WebClient
             self.client = WebClient(token=self.config.slack.bot_token)
         else:
             self.client = None
             self.logger.warning("Slack bot token not configured")
     
-    def get_channel_messages(self, channel_name: str, limit: int = 100) -> List[Dict[str, Any]]:
-        """Fetch feature requests from a Slack channel"""
+    def get_channel_messages(self, channel_name: str, limit: int = 100, incremental: bool = False) -> List[Dict[str, Any]]:
+        """Fetch feature requests from a Slack channel
+        
+        With incremental=True, only messages posted since the previous incremental
+        fetch of the same channel are returned (all pages of them); the first
+        incremental fetch behaves like a normal one.
+        """
         if not self.client:
             self.logger.error("Slack client not initialized")
             return []
         
+        from slack_sdk.errors import SlackApiError
+        
         try:
             # First, get channel ID from name
             channel_id = self._get_channel_id(channel_name)
@@ -32,28 +49,49 @@ class SlackIntegration:
                 self.logger.error(f"Channel '{channel_name}' not found")
                 return []
             
+            oldest = self._last_ts_per_channel.get(channel_id) if incremental else None
+            
             # Try to fetch messages from channel
             try:
-                response = self.client.conversations_history(
-                    channel=channel_id,
-                    limit=limit
-                )
-                
-                if response['ok']:
-                    feature_requests = []
-                    for message in response['messages']:
-                        if 'user' in message and 'text' in message:
-                            feature_requests.append({
-                                'user': message['user'],
-                                'text': message['text'],
-                                'timestamp': message.get('ts'),
-                                'type': 'feature_request'
-                            })
+                messages = []
+                cursor = None
+                while True:
+                    # Fetch everything new in as few round trips as possible; otherwise
+                    # ask for exactly the messages still needed to reach 'limit'
+                    if oldest is not None:
+                        page_size = SLACK_HISTORY_PAGE_SIZE
+                    else:
+                        page_size = min(limit - len(messages), SLACK_HISTORY_PAGE_SIZE)
+                    response = self.client.conversations_history(
+                        channel=channel_id,
+                        limit=page_size,
+                        oldest=oldest,
+                        cursor=cursor
+                    )
                     
-                    return feature_requests
-                else:
-                    self.logger.error(f"Slack API error: {response['error']}")
-                    return []
+                    if not response['ok']:
+                        self.logger.error(f"Slack API error: {response['error']}")
+                        return []
+                    
+                    messages.extend(response['messages'])
+                    cursor = response.get('response_metadata', {}).get('next_cursor')
+                    # Without an 'oldest' marker, 'limit' caps the fetch
+                    if not cursor or (oldest is None and len(messages) >= limit):
+                        break
+                
+                if incremental and messages:
+                    self._last_ts_per_channel[channel_id] = max((m['ts'] for m in messages), key=float)
+                
+                return [
+                    {
+                        'user': message['user'],
+                        'text': message['text'],
+                        'timestamp': message.get('ts'),
+                        'type': 'feature_request'
+                    }
+                    for message in messages
+                    if 'user' in message and 'text' in message
+                ]
                         
             except SlackApiError as e:
                 self.logger.error(f"Slack API error: {e}")
@@ -64,16 +102,38 @@ class SlackIntegration:
             return []
     
     def _get_channel_id(self, channel_name: str) -> str:
-        """Get channel ID from channel name"""
-        try:
-            response = self.client.conversations_list()
-            for channel in response['channels']:
-                if channel['name'] == channel_name:
-                    return channel['id']
-            return ""
-        except SlackApiError as e:
-            self.logger.error(f"Error getting channel list: {e}")
-            return ""
+        """Get channel ID from channel name (channel list is fetched once and cached)"""
+        # Raw channel IDs (public, private, DM) need no lookup
+        if channel_name[:1] in ('C', 'G', 'D') and channel_name.isupper():
+            return channel_name
+        
+        if not self._channels_loaded:
+            from slack_sdk.errors import SlackApiError
+            
+            try:
+                cursor = None
+                while True:
+                    response = self.client.conversations_list(
+                        limit=1000,
+                        exclude_archived=True,
+                        cursor=cursor
+                    )
+                    for channel in response['channels']:
+                        self._channel_id_cache[channel['name']] = channel['id']
+                    cursor = response.get('response_metadata', {}).get('next_cursor')
+                    if not cursor:
+                        break
+                self._channels_loaded = True
+            except SlackApiError as e:
+                self.logger.error(f"Error getting channel list: {e}")
+                return ""
+        
+        return self._channel_id_cache.get(channel_name, "")
+    
+    def invalidate_channel_cache(self) -> None:
+        """Drop the cached channel name -> ID index (e.g. after a channel rename)"""
+        self._channel_id_cache.clear()
+        self._channels_loaded = False
     
     def send_message(self, channel: str, message: str) -> bool:
         """Send a message to a Slack channel"""
@@ -81,6 +141,8 @@ class SlackIntegration:
             self.logger.error("Slack client not initialized")
             return False
         
+        from slack_sdk.errors import SlackApiError
+        
         try:
             channel_id = self._get_channel_id(channel)
             if not channel_id:
@@ -100,3 +162,18 @@ class SlackIntegration:
     def get_feedback_messages(self, feedback_channel: str = "customer-feedbacks") -> List[Dict[str, Any]]:
         """Get feedback messages from the designated feedback channel"""
         return self.get_channel_messages(feedback_channel, limit=50)
+    
+    def get_all_feedback(self, channels: List[str], limit: int = 100, incremental: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch messages from several Slack channels concurrently, keyed by channel name"""
+        if not self.client or not channels:
+            return {channel: [] for channel in channels}
+        
+        # Load the channel index up front so the workers don't race to fetch it
+        self._get_channel_id(channels[0])
+        
+        with ThreadPoolExecutor(max_workers=min(SLACK_MAX_WORKERS, len(channels))) as executor:
+            results = executor.map(
+                lambda channel: self.get_channel_messages(channel, limit=limit, incremental=incremental),
+                channels
+            )
+            return dict(zip(channels, results))
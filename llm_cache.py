@@ -0,0 +1,259 @@
+"""
+File-backed caches for LLM responses and feedback analysis
+Identical (or near-identical) planning requests are served from disk instead of
+calling the LLM again
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def _default_ttl_seconds() -> float:
+    """Cache entry lifetime from LLM_CACHE_TTL_SECONDS (default one day)"""
+    return float(os.getenv('LLM_CACHE_TTL_SECONDS', 24 * 60 * 60))
+
+def _default_enabled() -> bool:
+    """Whether plan caching is enabled, from LLM_CACHE_ENABLED (default on)"""
+    return os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+class LLMCache:
+    """Cache of LLM results keyed by model and prompt, stored as JSON files"""
+    
+    def __init__(self, cache_dir: str = ".cache/plans", ttl_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = _default_ttl_seconds() if ttl_seconds is None else ttl_seconds
+        self.enabled = _default_enabled() if enabled is None else enabled
+    
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """Build the cache key for a model/prompt pair"""
+        payload = json.dumps({"model": model, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None if missing, expired or disabled"""
+        if not self.enabled:
+            return None
+        
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {path}: {e}")
+            return None
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value; non-JSON values (e.g. SDK output objects) are stored as strings"""
+        if not self.enabled:
+            return
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._path(key), 'w') as f:
+                json.dump(value, f, default=str)
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry: {e}")
+
+# Words ignored when fingerprinting prompts
+_STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into',
+    'is', 'it', 'of', 'on', 'or', 'please', 'that', 'the', 'this', 'to', 'with'
+})
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+class PlanTemplateCache:
+    """Similarity-matched cache of generated plans
+    
+    Prompts are fingerprinted as sets of lowercase non-stopword tokens; a stored
+    plan is reused when the Jaccard similarity of the fingerprints reaches the
+    threshold. Callers should pass only the variable part of a prompt (e.g. the
+    feature being planned), not fixed instructions wrapped around it, or distinct
+    requests will look alike. Only the plan steps are kept: the raw LLM output
+    belongs to the original prompt and is never reused. Entries are kept in LRU
+    order, expire like LLMCache entries and are persisted to a JSON file.
+    """
+    
+    def __init__(self, path: str = ".cache/plan_templates.json", threshold: float = 0.9, max_entries: int = 50,
+                 ttl_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = _default_ttl_seconds() if ttl_seconds is None else ttl_seconds
+        self.enabled = _default_enabled() if enabled is None else enabled
+        self._templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._load()
+    
+    @staticmethod
+    def fingerprint(prompt: str) -> frozenset:
+        """Normalize a prompt into its set of significant tokens"""
+        return frozenset(w for w in _WORD_RE.findall(prompt.lower()) if w not in _STOPWORDS)
+    
+    def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the best matching stored plan, or None"""
+        if not self.enabled:
+            return None
+        
+        tokens = self.fingerprint(prompt)
+        if not tokens:
+            return None
+        
+        oldest = time.time() - self.ttl_seconds
+        best_key, best_score = None, 0.0
+        for key, entry in self._templates.items():
+            if entry['stored_at'] < oldest:
+                continue
+            stored = entry['tokens']
+            score = len(tokens & stored) / len(tokens | stored)
+            if score > best_score:
+                best_key, best_score = key, score
+        
+        if best_key is None or best_score < self.threshold:
+            return None
+        
+        self._templates.move_to_end(best_key)
+        return copy.deepcopy(self._templates[best_key]['plan'])
+    
+    def store(self, prompt: str, plan: Dict[str, Any]) -> None:
+        """Store a plan for a prompt, evicting expired and least recently used entries"""
+        if not self.enabled:
+            return
+        
+        tokens = self.fingerprint(prompt)
+        if not tokens:
+            return
+        
+        key = ' '.join(sorted(tokens))
+        # The raw output (used as the PRD) is specific to this prompt; keep only the steps.
+        # Round-trip through JSON so later edits to the live plan don't leak in
+        template = {k: v for k, v in plan.items() if k != 'plan_output'}
+        self._templates[key] = {
+            'tokens': tokens,
+            'plan': json.loads(json.dumps(template, default=str)),
+            'stored_at': time.time()
+        }
+        self._templates.move_to_end(key)
+        oldest = time.time() - self.ttl_seconds
+        for stale in [k for k, entry in self._templates.items() if entry['stored_at'] < oldest]:
+            del self._templates[stale]
+        while len(self._templates) > self.max_entries:
+            self._templates.popitem(last=False)
+        self._save()
+    
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable plan template file {self.path}: {e}")
+            return
+        
+        templates = OrderedDict()
+        try:
+            for entry in entries:
+                tokens = frozenset(entry['tokens'])
+                plan = {k: v for k, v in entry['plan'].items() if k != 'plan_output'}
+                # Entries written before timestamps were recorded count as expired
+                stored_at = float(entry.get('stored_at', 0.0))
+                templates[' '.join(sorted(tokens))] = {'tokens': tokens, 'plan': plan, 'stored_at': stored_at}
+        except (TypeError, KeyError, AttributeError, ValueError) as e:
+            # Valid JSON of the wrong shape; start empty rather than fail the caller
+            logger.warning(f"Ignoring malformed plan template file {self.path}: {e}")
+            return
+        self._templates = templates
+    
+    def _save(self) -> None:
+        entries = [
+            {'tokens': sorted(entry['tokens']), 'plan': entry['plan'], 'stored_at': entry['stored_at']}
+            for entry in self._templates.values()
+        ]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump(entries, f)
+        except OSError as e:
+            logger.warning(f"Failed to write plan template file: {e}")
+
+class SentimentCache:
+    """Sentiment scores of already analyzed feedback, keyed by a content hash
+    
+    Feeds re-deliver the same messages on every poll; scores for unchanged items
+    are reused instead of recomputed. Entries are kept in LRU order and persisted
+    to a JSON file.
+    """
+    
+    def __init__(self, path: str = ".cache/sentiment.json", max_entries: int = 10000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._dirty = False
+        self._load()
+    
+    @staticmethod
+    def make_key(scorer: str, source: Any, user: Any, text: str) -> str:
+        """Build the cache key for a feedback item scored by the named scorer"""
+        payload = json.dumps([scorer, source, user, text], default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[float]:
+        """Return the cached score for key, or None"""
+        score = self._scores.get(key)
+        if score is not None:
+            self._scores.move_to_end(key)
+        return score
+    
+    def set(self, key: str, score: float) -> None:
+        """Store a score, evicting the least recently used entries (call save() to persist)"""
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.max_entries:
+            self._scores.popitem(last=False)
+        self._dirty = True
+    
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                scores = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable sentiment cache file {self.path}: {e}")
+            return
+        
+        try:
+            self._scores.update((str(key), float(score)) for key, score in scores.items())
+        except (TypeError, KeyError, AttributeError, ValueError) as e:
+            # Valid JSON of the wrong shape; start empty rather than fail the caller
+            logger.warning(f"Ignoring malformed sentiment cache file {self.path}: {e}")
+            self._scores.clear()
+    
+    def save(self) -> None:
+        """Persist the cache if it changed"""
+        if not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump(self._scores, f)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Failed to write sentiment cache file: {e}")
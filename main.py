@@ -7,7 +7,6 @@ Coordinates the complete product management workflow with Portia SDK integration
 import os
 import sys
 import logging
-from dotenv import load_dotenv
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -19,11 +18,15 @@ logger = logging.getLogger(__name__)
 def main():
     """Main entry point for the PM Agentic AI System"""
     logger.info("🚀 Starting PM Agentic AI System with Portia SDK Integration")
+    from dotenv import load_dotenv
+    from config.env import snapshot
     load_dotenv()
+    env = snapshot()
     
-    # Check if required environment variables are set
+    # Check required environment variables before importing any of the heavy
+    # workflow/integration modules, so a misconfigured run fails fast
     required_vars = ['GOOGLE_API_KEY', 'SLACK_BOT_TOKEN', 'SLACK_APP_TOKEN', 'PORTIA_API_KEY']
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = [var for var in required_vars if not env.get(var)]
     
     if missing_vars:
         logger.error(f"Missing required environment variables: {missing_vars}")
@@ -34,7 +37,7 @@ def main():
     
     # Import and run the feature selection UI
     try:
-        from ui_feature_selection import FeatureSelectionUI, main as ui_main
+        from ui_feature_selection import main as ui_main
         logger.info("📋 Loading Feature Selection UI...")
         ui_main()
     except ImportError as e:
@@ -5,11 +5,16 @@ Human-in-the-loop controls with edit/check/uncheck/approve options
 """
 
 import os
+import re
 import sys
 import json
+import asyncio
 import logging
+import tempfile
+import string
+import functools
+import threading
 from typing import Dict, List, Any, Optional
-from dotenv import load_dotenv
 from enum import Enum
 
 # Import Pydantic for validation error handling
@@ -18,13 +23,102 @@ try:
 except ImportError:
     ValidationError = Exception  # Fallback if pydantic is not available
 
+# Use orjson's C encoder for JSON output files when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from llm_cache import LLMCache, PlanTemplateCache
+
+PORTIA_MODEL = "google/gemini-2.0-flash"
+# Append-only log of plan edits, compacted into approved_plan.json on approval
+PLAN_JOURNAL_PATH = "plan_journal.ndjson"
+
+# Lines of plan text that describe a step
+_LINE_STEP_RE = re.compile(r"^[^\n]*(?:step|phase|task|action)[^\n]*", re.IGNORECASE | re.MULTILINE)
+# Markers of errors or unresolved template variables in Portia output
+_ERROR_RE = re.compile(r"\{\$|Error:|validation error|LLMToolSchema")
+# Markers of validation errors in a completed Portia plan run
+_VALIDATION_ERROR_RE = re.compile(r"validation error|LLMToolSchema|InvalidAgentOutputError|Input should be a valid")
+# Portia asking for the PRD instead of producing it. Alternatives are factored
+# on their shared prefix/suffix so each position is tried once, not per phrase.
+_PRD_ASK_RE = re.compile(
+    r"p(?:lease provide the prd|rovide prd|rd required)|(?:i need the information from|need) the prd",
+    re.IGNORECASE
+)
+# Step ids of the form step_<n>
+_STEP_ID_RE = re.compile(r"step_(\d+)")
+# Key words used to title a PRD, as (lowercase form, title form) in priority order
+_TITLE_KEYWORDS = (
+    ("prd", "PRD"),
+    ("product requirements", "Product Requirements"),
+    ("feature", "Feature"),
+    ("integration", "Integration")
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _next_step_number(steps: List[Dict]) -> int:
+    """Number for the next step_<n> id, above every existing one (ids may be sparse)"""
+    numbers = [int(m.group(1)) for m in (_STEP_ID_RE.fullmatch(str(step.get('id', ''))) for step in steps) if m]
+    return max(numbers, default=0) + 1
+
+def _public_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan without internal bookkeeping keys (those starting with '_'), for output files"""
+    return {key: value for key, value in plan.items() if not key.startswith('_')}
+
+def _dump_json(obj: Any) -> bytes:
+    """Serialize obj as indented JSON (non-JSON values are stored as strings)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, default=str).encode('utf-8')
+
+def _dump_json_line(obj: Any) -> bytes:
+    """Serialize obj as a single compact JSON line"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE, default=str)
+    return json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+def _write_bytes_atomic(path: str, data: bytes) -> None:
+    """Write data to path via a temp file, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates the file as 0600; keep the mode a plain open() would give
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _write_json_atomic(path: str, obj: Any) -> None:
+    """Write obj as JSON to path atomically"""
+    _write_bytes_atomic(path, _dump_json(obj))
+
+@functools.lru_cache(maxsize=1)
+def _filtered_tools() -> List[Any]:
+    """Example Portia tools without the search tool (avoids TAVILY_API_KEY issues), built once"""
+    from portia import example_tool_registry
+    
+    return [
+        tool for tool in example_tool_registry
+        if hasattr(tool, 'id') and 'search' not in tool.id.lower()
+    ]
+
 class UserAction(Enum):
     APPROVE = "approve"
     EDIT = "edit"
@@ -33,39 +127,123 @@ class UserAction(Enum):
     ADD = "add"
     SKIP = "skip"
 
+# Menu keys for the plan review prompt ('q' quits)
+_ACTION_MAP = {
+    'c': UserAction.CHECK,
+    'e': UserAction.EDIT,
+    'a': UserAction.ADD,
+    's': UserAction.SKIP,
+    'x': UserAction.APPROVE
+}
+
+# Fallback PRD used when Portia asks for the PRD instead of writing it
+_FALLBACK_PRD_TMPL = string.Template("""# $title
+
+## Overview
+This PRD was automatically generated as a fallback when the Portia SDK requested PRD content instead of providing it.
+
+## Problem Statement
+Based on the user request: $prompt...
+
+## Business Requirements
+1. Implement the requested functionality to address user needs
+2. Ensure seamless integration with existing systems and workflows
+3. Maintain high performance and scalability standards
+4. Provide excellent user experience and intuitive interface
+5. Include comprehensive testing and validation procedures
+
+## Technical Requirements
+1. API integration and data exchange protocols
+2. Security and authentication mechanisms
+3. Error handling and logging
+4. Monitoring and alerting systems
+5. Documentation and deployment procedures
+
+## User Stories
+- As a user, I want [functionality] so that I can [benefit]
+- As an admin, I need [management capability] to ensure [operational need]
+- As a stakeholder, I require [reporting/analytics] to measure [success metrics]
+
+## Acceptance Criteria
+- [ ] Feature implemented according to specifications
+- [ ] Integration tested with all relevant systems
+- [ ] Performance meets defined benchmarks
+- [ ] Security requirements fully addressed
+- [ ] Documentation complete and accurate
+
+## Timeline & Milestones
+- Phase 1: Research and Analysis (1-2 weeks)
+- Phase 2: Development and Implementation (2-4 weeks)  
+- Phase 3: Testing and Quality Assurance (1-2 weeks)
+- Phase 4: Deployment and Rollout (1 week)
+- Phase 5: Monitoring and Optimization (ongoing)
+
+## Success Metrics
+- User adoption and engagement rates
+- System performance and reliability
+- Error rates and resolution times
+- Customer satisfaction scores
+- Business impact and ROI
+
+## Notes
+This is an automatically generated fallback PRD. Please review and enhance with specific technical details, user stories, and acceptance criteria based on the actual requirements.
+""")
+
+@functools.lru_cache(maxsize=128)
+def _fallback_prd_title(prompt: str) -> str:
+    """Pick the fallback PRD title from key information in the prompt"""
+    prompt_lower = prompt.lower()
+    if "slack" in prompt_lower and "integration" in prompt_lower:
+        return "Slack Integration PRD"
+    if "feature" in prompt_lower:
+        return "Feature Implementation PRD"
+    return "Product Requirements Document"
+
 class PMAgentWorkflow:
     """Main PM Agent Workflow Controller with Portia SDK Integration"""
     
     def __init__(self):
-        load_dotenv()
-        self.portia = None
+        self._portia = None
+        self._portia_initialized = False
+        self._no_api_key = False
+        self._create_prd_in_notion = None
+        self._workflow_task = None
+        self._journal = None
+        self._journal_key = None
+        # Guards current_plan, the journal and the template cache when plans are generated concurrently
+        self._plan_lock = threading.Lock()
         self.current_plan = None
         self.user_selections = {}
-        self.initialize_portia()
+        self.plan_cache = LLMCache()
+        self.template_cache = PlanTemplateCache()
+    
+    @property
+    def portia(self):
+        """Portia SDK client, initialized on first use"""
+        if not self._portia_initialized:
+            self._portia_initialized = True
+            self.initialize_portia()
+        return self._portia
     
     def initialize_portia(self):
         """Initialize Portia SDK with Google GenAI"""
         try:
-            from portia import Config, LLMProvider, Portia, example_tool_registry
+            from portia import Config, LLMProvider, Portia
             
             GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
             if not GOOGLE_API_KEY:
                 logger.error("GOOGLE_API_KEY not found in environment variables")
+                self._no_api_key = True
                 return
             
             google_config = Config.from_default(
                 llm_provider=LLMProvider.GOOGLE,
-                default_model="google/gemini-2.0-flash",
+                default_model=PORTIA_MODEL,
                 google_api_key=GOOGLE_API_KEY
             )
             
-            # Create a custom tool registry without the search tool to avoid TAVILY_API_KEY issues
-            custom_tools = []
-            for tool in example_tool_registry:
-                if hasattr(tool, 'id') and 'search' not in tool.id.lower():
-                    custom_tools.append(tool)
-            
-            self.portia = Portia(config=google_config, tools=custom_tools)
+            # Use a custom tool list without the search tool to avoid TAVILY_API_KEY issues
+            self._portia = Portia(config=google_config, tools=_filtered_tools())
             logger.info("✅ Portia SDK initialized successfully with custom tools (search tool excluded)")
             
         except ImportError:
@@ -73,36 +251,61 @@ class PMAgentWorkflow:
         except Exception as e:
             logger.error(f"Failed to initialize Portia: {str(e)}")
     
-    def generate_plan(self, user_prompt: str) -> Optional[Dict]:
-        """Generate plan using Portia SDK with user prompt"""
-        if not self.portia:
-            logger.error("Portia not initialized")
-            return None
+    def generate_plan(self, user_prompt: str, template_key: Optional[str] = None) -> Optional[Dict]:
+        """Generate plan using Portia SDK with user prompt
+        
+        template_key is the variable part of the prompt (e.g. the feature being
+        planned), used to match plans from similar earlier requests; it defaults
+        to the whole prompt.
+        
+        The plan is built separately and only becomes current_plan at the end, so
+        concurrent calls (see agenerate_plan) each return their own prompt's plan.
+        """
+        if template_key is None:
+            template_key = user_prompt
+        
+        # The prompt doesn't change between attempts, so prepare it once
+        sanitized_prompt = self._sanitize_prompt(user_prompt)
+        
+        cache_key = LLMCache.make_key(PORTIA_MODEL, sanitized_prompt)
+        plan = self._build_plan(user_prompt, template_key, sanitized_prompt, cache_key)
+        if plan is not None:
+            with self._plan_lock:
+                self._start_journal(cache_key, plan)
+                self.current_plan = plan
+        return plan
+    
+    def _build_plan(self, user_prompt: str, template_key: str, sanitized_prompt: str, cache_key: str) -> Optional[Dict]:
+        """Build a plan for the prompt (cached, from a template, from Portia or the defaults)"""
+        cached_plan = self.plan_cache.get(cache_key)
+        if cached_plan:
+            logger.info("📋 Using cached plan for this prompt")
+            return cached_plan
+        
+        template_plan = self.template_cache.lookup(template_key)
+        if template_plan:
+            logger.info("📋 Using plan template from a similar previous prompt")
+            template_plan['original_prompt'] = user_prompt
+            # The template's Portia output answered a different prompt, so it
+            # must not be published as this prompt's PRD
+            template_plan['plan_output'] = ''
+            template_plan['_from_template'] = True
+            return template_plan
+        
+        # Without a usable Portia client every attempt would fail; go straight to defaults
+        if self._no_api_key or not self.portia:
+            logger.warning("Portia not available. Using default plan steps...")
+            return self._create_default_plan(user_prompt)
         
         try:
             logger.info("🧠 Generating plan with Portia SDK...")
             retries = 3
             result = None
             
+            logger.info("Sending prompt to Portia: %s", sanitized_prompt)
+            
             for attempt in range(retries):
                 try:
-                    # Prepare the input for the Portia SDK
-                    sanitized_prompt = user_prompt.replace('$', '')  # Remove any template variables
-                    logger.info(f"Sending prompt to Portia: {sanitized_prompt}")
-                    
-                    # Check for unresolved template variables and provide fallback values
-                    template_vars = {}
-                    if '$problem_statement' in sanitized_prompt:
-                        template_vars['problem_statement'] = "The problem statement will be defined based on user requirements"
-                        sanitized_prompt = sanitized_prompt.replace('$problem_statement', template_vars['problem_statement'])
-                    
-                    if '$success_metrics' in sanitized_prompt:
-                        template_vars['success_metrics'] = "Success metrics will include user adoption, performance, and business impact"
-                        sanitized_prompt = sanitized_prompt.replace('$success_metrics', template_vars['success_metrics'])
-                    
-                    if template_vars:
-                        logger.info(f"Resolved template variables: {template_vars}")
-                    
                     # Call Portia SDK with the sanitized prompt as a string
                     # The SDK expects a string input based on the validation error
                     try:
@@ -121,7 +324,7 @@ class PMAgentWorkflow:
                             if isinstance(output, dict):
                                 for key in output.keys():
                                     if isinstance(output[key], str) and '{$' in output[key]:
-                                        logger.warning(f"Output contains unresolved template variable: {output[key]}")
+                                        logger.warning("Output contains unresolved template variable: %s", output[key])
                                         return self._create_default_plan(user_prompt)
                     if result is None:
                         logger.error("Received None from Portia SDK. Check the API call.")
@@ -132,7 +335,11 @@ class PMAgentWorkflow:
                             logger.warning("All attempts returned None. Using default plan...")
                             return self._create_default_plan(user_prompt)
                     else:
-                        logger.info(f"Raw output from Portia SDK: {result}")
+                        # Stringify the (possibly large) result only once, and only if it's needed
+                        result_str = None
+                        if logger.isEnabledFor(logging.INFO):
+                            result_str = str(result)
+                            logger.info("Raw output from Portia SDK: %s", result_str)
                         # Check if the plan run failed
                         if hasattr(result, 'state') and hasattr(result.state, 'name'):
                             if result.state.name == 'FAILED':
@@ -140,13 +347,9 @@ class PMAgentWorkflow:
                                 return self._create_default_plan(user_prompt)
                             elif result.state.name == 'COMPLETE':
                                 # Even if complete, check if the output contains validation errors
-                                result_str = str(result)
-                                if any(pattern in result_str for pattern in [
-                                    'validation error', 
-                                    'LLMToolSchema',
-                                    'InvalidAgentOutputError',
-                                    'Input should be a valid'
-                                ]):
+                                if result_str is None:
+                                    result_str = str(result)
+                                if _VALIDATION_ERROR_RE.search(result_str):
                                     logger.warning("Portia SDK completed but with validation errors. Using default plan steps...")
                                     return self._create_default_plan(user_prompt)
                     break  # Exit the retry loop if successful
@@ -178,19 +381,24 @@ class PMAgentWorkflow:
             try:
                 if result is not None and hasattr(result, 'outputs') and hasattr(result.outputs, 'final_output'):
                     plan_output = result.outputs.final_output.value
-                    logger.info(f"📋 Plan generated: {str(plan_output)[:100]}...")
+                    plan_text = str(plan_output)
+                    logger.info("📋 Plan generated: %s...", plan_text[:100])
                     
                     # Extract plan steps from the Portia output
-                    plan_steps = self._extract_plan_steps(plan_output)
+                    plan_steps = self._extract_plan_steps(plan_output, plan_text)
                     
-                    self.current_plan = {
+                    plan = {
                         'original_prompt': user_prompt,
                         'plan_output': plan_output,
                         'steps': plan_steps,
-                        'status': 'generated'
+                        'status': 'generated',
+                        '_next_id': _next_step_number(plan_steps)
                     }
+                    self.plan_cache.set(cache_key, plan)
+                    with self._plan_lock:
+                        self.template_cache.store(template_key, plan)
                     
-                    return self.current_plan
+                    return plan
                 else:
                     logger.warning("Portia SDK returned invalid output structure. Using default plan steps...")
                     return self._create_default_plan(user_prompt)
@@ -207,44 +415,76 @@ class PMAgentWorkflow:
             return None
     
     
-    def _extract_plan_steps(self, plan_output: Any) -> List[Dict]:
-        """Extract plan steps from Portia output (handles both structured and text output)"""
-        steps = []
+    @staticmethod
+    def _sanitize_prompt(user_prompt: str) -> str:
+        """Prepare a user prompt for the Portia SDK
+        
+        Known template variables get fallback values; any other '$' is removed so
+        Portia doesn't treat it as an unresolved template variable.
+        """
+        template_vars = {}
+        if '$problem_statement' in user_prompt:
+            template_vars['problem_statement'] = "The problem statement will be defined based on user requirements"
+            user_prompt = user_prompt.replace('$problem_statement', template_vars['problem_statement'])
         
+        if '$success_metrics' in user_prompt:
+            template_vars['success_metrics'] = "Success metrics will include user adoption, performance, and business impact"
+            user_prompt = user_prompt.replace('$success_metrics', template_vars['success_metrics'])
+        
+        if template_vars:
+            logger.info("Resolved template variables: %s", template_vars)
+        
+        return user_prompt.replace('$', '')
+    
+    async def agenerate_plan(self, user_prompt: str, template_key: Optional[str] = None) -> Optional[Dict]:
+        """Async variant of generate_plan
+        
+        The Portia SDK call is blocking, so it runs in a worker thread; the event
+        loop stays free to drive other I/O (e.g. integration calls) meanwhile.
+        Each call returns its own prompt's plan; current_plan is the one that
+        finished last.
+        """
+        return await asyncio.to_thread(self.generate_plan, user_prompt, template_key)
+    
+    def _extract_plan_steps(self, plan_output: Any, plan_text: Optional[str] = None) -> List[Dict]:
+        """Extract plan steps from Portia output (handles both structured and text output)
+        
+        plan_text is str(plan_output), if the caller already has it.
+        """
         # Check if the output contains error messages with template variables
-        plan_text = str(plan_output)
+        if plan_text is None:
+            plan_text = str(plan_output)
         
         # If the output contains template variables or error messages, use default steps
-        if any(pattern in plan_text for pattern in ['{$', 'Error:', 'validation error', 'LLMToolSchema']):
+        if _ERROR_RE.search(plan_text):
             logger.warning("Portia output contains errors or template variables. Using default steps.")
             return self._get_default_steps()
         
         # If plan_output is already a list of steps, use it directly
         if isinstance(plan_output, list):
-            for i, step in enumerate(plan_output):
-                if isinstance(step, dict) and 'description' in step:
-                    steps.append({
-                        'id': step.get('id', f"step_{i+1}"),
-                        'description': step['description'],
-                        'checked': step.get('checked', False),
-                        'editable': step.get('editable', True),
-                        'user_modified': step.get('user_modified', False)
-                    })
-            return steps
-        
-        # If plan_output is a string, parse it for step-like content
-        lines = plan_text.split('\n')
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line and any(keyword in line.lower() for keyword in ['step', 'phase', 'task', 'action']):
-                steps.append({
-                    'id': f"step_{i+1}",
-                    'description': line,
-                    'checked': False,
-                    'editable': True,
-                    'user_modified': False
-                })
+            return [
+                {
+                    'id': step.get('id', f"step_{i+1}"),
+                    'description': step['description'],
+                    'checked': step.get('checked', False),
+                    'editable': step.get('editable', True),
+                    'user_modified': step.get('user_modified', False)
+                }
+                for i, step in enumerate(plan_output)
+                if isinstance(step, dict) and 'description' in step
+            ]
+        
+        # If plan_output is a string, parse it for step-like content in one sweep
+        steps = [
+            {
+                'id': f"step_{i+1}",
+                'description': match.group(0).strip(),
+                'checked': False,
+                'editable': True,
+                'user_modified': False
+            }
+            for i, match in enumerate(_LINE_STEP_RE.finditer(plan_text))
+        ]
         
         # If no steps found, use default steps
         if not steps:
@@ -256,14 +496,14 @@ class PMAgentWorkflow:
         """Create a default plan when Portia SDK fails"""
         logger.info("Creating default plan due to Portia SDK failure")
         
-        self.current_plan = {
+        steps = self._get_default_steps()
+        return {
             'original_prompt': user_prompt,
             'plan_output': 'Portia SDK failed to generate plan. Using default steps.',
-            'steps': self._get_default_steps(),
-            'status': 'generated'
+            'steps': steps,
+            'status': 'generated',
+            '_next_id': _next_step_number(steps)
         }
-        
-        return self.current_plan
     
     def _get_default_steps(self) -> List[Dict]:
         """Return default plan steps when Portia fails or returns invalid output"""
@@ -283,13 +523,13 @@ class PMAgentWorkflow:
         logger.info("\n" + "="*80)
         logger.info("📋 PLAN GENERATED - PLEASE REVIEW AND MODIFY")
         logger.info("="*80)
-        logger.info(f"Original Prompt: {self.current_plan['original_prompt']}")
+        logger.info("Original Prompt: %s", self.current_plan['original_prompt'])
         logger.info("\nPlan Steps:")
         
         for i, step in enumerate(self.current_plan['steps']):
             status = "✅" if step['checked'] else "◻️"
             modified = " (Modified)" if step['user_modified'] else ""
-            logger.info(f"{i+1}. {status} {step['description']}{modified}")
+            logger.info("%d. %s %s%s", i + 1, status, step['description'], modified)
         
         logger.info("\nOptions:")
         logger.info("  [c] Check/Uncheck step")
@@ -302,23 +542,15 @@ class PMAgentWorkflow:
     def get_user_action(self) -> UserAction:
         """Get user action for the current plan"""
         try:
-            choice = input("\nChoose action: ").lower().strip()
-            
-            if choice == 'c':
-                return UserAction.CHECK
-            elif choice == 'e':
-                return UserAction.EDIT
-            elif choice == 'a':
-                return UserAction.ADD
-            elif choice == 's':
-                return UserAction.SKIP
-            elif choice == 'x':
-                return UserAction.APPROVE
-            elif choice == 'q':
-                sys.exit(0)
-            else:
+            while True:
+                choice = input("\nChoose action: ").lower().strip()
+                if choice == 'q':
+                    sys.exit(0)
+                
+                action = _ACTION_MAP.get(choice)
+                if action is not None:
+                    return action
                 logger.error("Invalid choice. Please try again.")
-                return self.get_user_action()
                 
         except (EOFError, KeyboardInterrupt):
             logger.info("\nExiting...")
@@ -326,16 +558,13 @@ class PMAgentWorkflow:
     
     def handle_user_action(self, action: UserAction):
         """Handle user action on the current plan"""
-        if action == UserAction.CHECK:
-            self.toggle_step_check()
-        elif action == UserAction.EDIT:
-            self.edit_step()
-        elif action == UserAction.ADD:
-            self.add_step()
-        elif action == UserAction.SKIP:
-            logger.info("Skipping to next step...")
-        elif action == UserAction.APPROVE:
-            self.approve_plan()
+        handler = self._HANDLERS.get(action)
+        if handler:
+            handler(self)
+    
+    def skip_step(self):
+        """Skip to the next step"""
+        logger.info("Skipping to next step...")
     
     def toggle_step_check(self):
         """Toggle check/uncheck for a step"""
@@ -344,8 +573,9 @@ class PMAgentWorkflow:
             if 0 <= step_num < len(self.current_plan['steps']):
                 step = self.current_plan['steps'][step_num]
                 step['checked'] = not step['checked']
+                self._journal_edit({'op': 'check', 'i': step_num, 'checked': step['checked']})
                 status = "checked" if step['checked'] else "unchecked"
-                logger.info(f"Step {step_num + 1} {status}")
+                logger.info("Step %d %s", step_num + 1, status)
             else:
                 logger.error("Invalid step number")
         except ValueError:
@@ -361,6 +591,7 @@ class PMAgentWorkflow:
                 if new_desc:
                     step['description'] = new_desc
                     step['user_modified'] = True
+                    self._journal_edit({'op': 'edit', 'i': step_num, 'description': new_desc})
                     logger.info("Step updated successfully")
             else:
                 logger.error("Invalid step number")
@@ -371,14 +602,18 @@ class PMAgentWorkflow:
         """Add new step to the plan"""
         new_desc = input("Enter new step description: ").strip()
         if new_desc:
+            # Monotonic counter, so new ids never collide with existing ones
+            next_id = self.current_plan.setdefault('_next_id', _next_step_number(self.current_plan['steps']))
+            self.current_plan['_next_id'] = next_id + 1
             new_step = {
-                'id': f"step_{len(self.current_plan['steps']) + 1}",
+                'id': f"step_{next_id}",
                 'description': new_desc,
                 'checked': False,
                 'editable': True,
                 'user_modified': True
             }
             self.current_plan['steps'].append(new_step)
+            self._journal_edit({'op': 'add', 'step': new_step})
             logger.info("New step added successfully")
     
     def approve_plan(self):
@@ -387,24 +622,141 @@ class PMAgentWorkflow:
         self.current_plan['status'] = 'approved'
         
         # Save approved plan
-        with open('approved_plan.json', 'w') as f:
-            json.dump(self.current_plan, f, indent=2)
+        _write_json_atomic('approved_plan.json', _public_plan(self.current_plan))
+        self._compact_journal()
         
         # Continue with next steps (PRD generation, GitHub issues, etc.)
         self.continue_workflow()
     
-    def continue_workflow(self):
-        """Continue workflow after plan approval"""
-        logger.info("🚀 Continuing workflow execution...")
+    def _start_journal(self, plan_key: str, plan: Dict):
+        """Journal edits for plan, first replaying any edits already journaled for it
         
-        # Generate PRD draft and send to Notion
-        logger.info("📝 Generating PRD draft...")
-        prd_sent = self.send_prd_to_notion()
+        This is how unapproved edits survive a crash: generating the same prompt's
+        plan again (a cache hit, or the same prompt after a restart) reapplies
+        them. A journal left by any other plan is discarded.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._journaled_plan_key() == plan_key:
+            self.replay_journal(plan, plan_key)
+            logger.info("📝 Restored unsaved plan edits from the journal")
+        else:
+            self._compact_journal()
+        self._journal_key = plan_key
+    
+    @staticmethod
+    def _journaled_plan_key(path: str = PLAN_JOURNAL_PATH) -> Optional[str]:
+        """Key of the plan the journal holds edits for, or None if it's empty or unreadable"""
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        return json.loads(line).get('plan')
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Could not read plan journal: {str(e)}")
+        return None
+    
+    def _journal_edit(self, entry: Dict[str, Any]):
+        """Append a plan edit to the journal (O(1) per edit, unlike rewriting the plan)"""
+        try:
+            if self._journal is None:
+                self._journal = open(PLAN_JOURNAL_PATH, 'ab')
+            entry['plan'] = self._journal_key
+            self._journal.write(_dump_json_line(entry))
+            self._journal.flush()
+        except OSError as e:
+            logger.warning(f"Could not journal plan edit: {str(e)}")
+    
+    def _compact_journal(self):
+        """Close and truncate the edit journal once the full plan has been saved"""
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            # Don't create the journal if nothing was ever edited
+            if os.path.exists(PLAN_JOURNAL_PATH):
+                os.truncate(PLAN_JOURNAL_PATH, 0)
+        except OSError as e:
+            logger.warning(f"Could not compact plan journal: {str(e)}")
+    
+    @staticmethod
+    def replay_journal(plan: Dict, plan_key: str, path: str = PLAN_JOURNAL_PATH) -> Dict:
+        """Apply journaled edits to plan, e.g. to recover unsaved changes after a crash
         
-        # Other workflow steps
-        logger.info("📋 Creating GitHub issues...")
-        logger.info("📢 Notifying stakeholders via Slack...")
-        logger.info("📅 Scheduling review meeting...")
+        plan_key is the cache key of the prompt the plan was generated for; edits
+        journaled for any other plan are ignored.
+        """
+        if not os.path.exists(path):
+            return plan
+        steps = plan['steps']
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get('plan') != plan_key:
+                    continue
+                op = entry.get('op')
+                if op == 'add':
+                    # Advance the id counter as add_step did
+                    plan['_next_id'] = plan.setdefault('_next_id', _next_step_number(steps)) + 1
+                    steps.append(entry['step'])
+                elif op in ('check', 'edit'):
+                    if not 0 <= entry['i'] < len(steps):
+                        logger.warning(f"Skipping journaled {op} for missing step {entry['i']}")
+                        continue
+                    step = steps[entry['i']]
+                    if op == 'check':
+                        step['checked'] = entry['checked']
+                    else:
+                        step['description'] = entry['description']
+                        step['user_modified'] = True
+        return plan
+    
+    # Plan review handlers by user action
+    _HANDLERS = {
+        UserAction.CHECK: toggle_step_check,
+        UserAction.EDIT: edit_step,
+        UserAction.ADD: add_step,
+        UserAction.SKIP: skip_step,
+        UserAction.APPROVE: approve_plan
+    }
+    
+    def continue_workflow(self) -> Optional[asyncio.Task]:
+        """Continue workflow after plan approval
+        
+        Called from inside a running event loop (e.g. by an async caller of
+        agenerate_plan), the steps are scheduled on that loop and the task is
+        returned; otherwise they run to completion here.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.acontinue_workflow())
+            return None
+        # Keep a reference so the task isn't garbage collected before it finishes
+        self._workflow_task = loop.create_task(self.acontinue_workflow())
+        return self._workflow_task
+    
+    async def acontinue_workflow(self):
+        """Continue workflow after plan approval, running the independent steps concurrently"""
+        logger.info("🚀 Continuing workflow execution...")
+        
+        # PRD, GitHub, Slack and calendar steps don't depend on each other
+        step_names = ('notion', 'github', 'slack', 'calendar')
+        results = await asyncio.gather(
+            self._notion_task(),
+            self._github_task(),
+            self._slack_task(),
+            self._calendar_task(),
+            return_exceptions=True
+        )
+        for name, result in zip(step_names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Workflow step '{name}' failed: {str(result)}")
+        prd_sent = results[0] is True
         
         if prd_sent:
             logger.info("✅ Workflow completed successfully with PRD sent to Notion!")
@@ -413,19 +765,37 @@ class PMAgentWorkflow:
         
         # Save workflow results
         workflow_results = {
-            'plan': self.current_plan,
+            'plan': _public_plan(self.current_plan),
             'status': 'completed',
             'prd_sent_to_notion': prd_sent,
             'timestamp': '2025-08-24T18:00:00Z'
         }
         
-        with open('workflow_results.json', 'w') as f:
-            json.dump(workflow_results, f, indent=2)
+        _write_json_atomic('workflow_results.json', workflow_results)
+    
+    async def _notion_task(self) -> bool:
+        """Generate PRD draft and send to Notion"""
+        logger.info("📝 Generating PRD draft...")
+        return await asyncio.to_thread(self.send_prd_to_notion)
+    
+    async def _github_task(self):
+        """Create GitHub issues for the approved plan"""
+        logger.info("📋 Creating GitHub issues...")
+    
+    async def _slack_task(self):
+        """Notify stakeholders via Slack"""
+        logger.info("📢 Notifying stakeholders via Slack...")
+    
+    async def _calendar_task(self):
+        """Schedule the review meeting"""
+        logger.info("📅 Scheduling review meeting...")
     
     def send_prd_to_notion(self) -> bool:
         """Send the generated PRD to Notion"""
         try:
-            from integrations.notion_integration import create_prd_in_notion
+            if self._create_prd_in_notion is None:
+                from integrations.notion_integration import create_prd_in_notion
+                self._create_prd_in_notion = create_prd_in_notion
             
             # Extract PRD content from the plan
             prd_content = self._extract_prd_content()
@@ -437,10 +807,10 @@ class PMAgentWorkflow:
             title = self._generate_prd_title()
             
             # Send to Notion
-            page_id = create_prd_in_notion(title, prd_content)
+            page_id = self._create_prd_in_notion(title, prd_content)
             
             if page_id:
-                logger.info(f"✅ PRD successfully sent to Notion (Page ID: {page_id})")
+                logger.info("✅ PRD successfully sent to Notion (Page ID: %s)", page_id)
                 return True
             else:
                 logger.error("Failed to send PRD to Notion")
@@ -459,119 +829,49 @@ class PMAgentWorkflow:
             logger.warning("No current plan available for PRD extraction")
             return ""
         
+        # A plan reused from a similar prompt has no PRD written for this prompt
+        if self.current_plan.get('_from_template'):
+            logger.info("Plan was reused from a similar prompt; generating the PRD for this prompt")
+            return self._generate_fallback_prd()
+        
         plan_output = self.current_plan.get('plan_output', '')
         
-        # Check if Portia is asking for PRD instead of providing it
+        # Convert the output to text once
         if isinstance(plan_output, str):
-            if any(phrase in plan_output.lower() for phrase in [
-                "please provide the prd",
-                "need the prd", 
-                "provide prd",
-                "prd required",
-                "i need the information from the prd"
-            ]):
-                logger.warning("Portia SDK is asking for PRD content instead of providing it")
-                return self._generate_fallback_prd()
-            return plan_output
-        
+            content = plan_output
         elif hasattr(plan_output, 'value'):
             content = str(plan_output.value)
-            if any(phrase in content.lower() for phrase in [
-                "please provide the prd",
-                "need the prd",
-                "provide prd", 
-                "prd required",
-                "i need the information from the prd"
-            ]):
-                logger.warning("Portia SDK is asking for PRD content in structured output")
-                return self._generate_fallback_prd()
-            return content
-        
         else:
-            logger.warning(f"Unexpected plan_output type: {type(plan_output)}")
+            logger.warning("Unexpected plan_output type: %s", type(plan_output))
             return str(plan_output)
+        
+        # Check if Portia is asking for PRD instead of providing it
+        if _PRD_ASK_RE.search(content):
+            logger.warning("Portia SDK is asking for PRD content instead of providing it")
+            return self._generate_fallback_prd()
+        return content
     
     def _generate_fallback_prd(self) -> str:
         """Generate a detailed fallback PRD when Portia doesn't provide content"""
         prompt = self.current_plan.get('original_prompt', 'Unknown feature')
         
-        # Extract key information from the prompt for more specific PRD content
-        prd_title = "Product Requirements Document"
-        if "slack" in prompt.lower() and "integration" in prompt.lower():
-            prd_title = "Slack Integration PRD"
-        elif "feature" in prompt.lower():
-            prd_title = "Feature Implementation PRD"
-        
-        return f"""# {prd_title}
-
-## Overview
-This PRD was automatically generated as a fallback when the Portia SDK requested PRD content instead of providing it.
-
-## Problem Statement
-Based on the user request: {prompt[:200]}...
-
-## Business Requirements
-1. Implement the requested functionality to address user needs
-2. Ensure seamless integration with existing systems and workflows
-3. Maintain high performance and scalability standards
-4. Provide excellent user experience and intuitive interface
-5. Include comprehensive testing and validation procedures
-
-## Technical Requirements
-1. API integration and data exchange protocols
-2. Security and authentication mechanisms
-3. Error handling and logging
-4. Monitoring and alerting systems
-5. Documentation and deployment procedures
-
-## User Stories
-- As a user, I want [functionality] so that I can [benefit]
-- As an admin, I need [management capability] to ensure [operational need]
-- As a stakeholder, I require [reporting/analytics] to measure [success metrics]
-
-## Acceptance Criteria
-- [ ] Feature implemented according to specifications
-- [ ] Integration tested with all relevant systems
-- [ ] Performance meets defined benchmarks
-- [ ] Security requirements fully addressed
-- [ ] Documentation complete and accurate
-
-## Timeline & Milestones
-- Phase 1: Research and Analysis (1-2 weeks)
-- Phase 2: Development and Implementation (2-4 weeks)  
-- Phase 3: Testing and Quality Assurance (1-2 weeks)
-- Phase 4: Deployment and Rollout (1 week)
-- Phase 5: Monitoring and Optimization (ongoing)
-
-## Success Metrics
-- User adoption and engagement rates
-- System performance and reliability
-- Error rates and resolution times
-- Customer satisfaction scores
-- Business impact and ROI
-
-## Notes
-This is an automatically generated fallback PRD. Please review and enhance with specific technical details, user stories, and acceptance criteria based on the actual requirements.
-"""
+        return _FALLBACK_PRD_TMPL.substitute(title=_fallback_prd_title(prompt), prompt=prompt[:200])
     
     def _generate_prd_title(self) -> str:
         """Generate a title for the PRD based on the original prompt"""
         prompt = self.current_plan.get('original_prompt', 'Product Requirements Document')
         
         # Extract key words for title
-        title_keywords = ["PRD", "Product Requirements", "Feature", "Integration"]
-        for keyword in title_keywords:
-            if keyword.lower() in prompt.lower():
-                return f"{keyword} - {prompt[:50]}..."
-        
-        return f"PRD - {prompt[:50]}..."
+        prompt_lower = prompt.lower()
+        keyword = next((title for word, title in _TITLE_KEYWORDS if word in prompt_lower), "PRD")
+        return f"{keyword} - {prompt[:50]}..."
     
-    def run_workflow(self, user_prompt: str):
-        """Main workflow execution"""
+    def run_workflow(self, user_prompt: str, template_key: Optional[str] = None):
+        """Main workflow execution (template_key: see generate_plan)"""
         logger.info("🤖 Starting PM Agent Workflow...")
         
         # Step 1: Generate plan with Portia
-        plan = self.generate_plan(user_prompt)
+        plan = self.generate_plan(user_prompt, template_key)
         if not plan:
             logger.error("Failed to generate plan. Exiting.")
             return
@@ -597,4 +897,6 @@ def main():
     workflow.run_workflow(user_prompt)
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     main()
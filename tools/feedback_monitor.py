@@ -1,220 +1,472 @@
-from typing import List, Dict, Any
+import os
+import re
+import sys
+import html
+import heapq
+from typing import List, Dict, Any, Optional, Union
 import logging
-import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import chain, repeat
+from operator import attrgetter
 from datetime import datetime
+from urllib.parse import urlparse
 from config.config import get_config
 from integrations.slack_integration import SlackIntegration
+from integrations._http import POOL_SIZE, shared_session
+from llm_cache import SentimentCache
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+# Feedback texts classified per LLM request
+SENTIMENT_BATCH_SIZE = 100
+
+# TextBlob batches smaller than this are scored in-process (pool startup costs more)
+SENTIMENT_PROCESS_MIN_ITEMS = 100
+# Texts handed to a worker process at a time
+SENTIMENT_PROCESS_CHUNK_SIZE = 256
+
+# Concurrent page fetches when gathering web feedback (matches the shared pool size)
+WEB_MAX_WORKERS = POOL_SIZE
+
+# Sentiment label indexed by (polarity > 0.1) - (polarity < -0.1)
+_SENTIMENT_LABELS = ("neutral", "positive", "negative")
+
+# Impact weight of each sentiment (unanalyzed items count as neutral)
+_IMPACT_SENTIMENT_WEIGHTS = {"positive": 0.3, "negative": 0.7, "neutral": 0.1}
+
+# Word polarities in [-1, 1] (TextBlob-like values) for the opt-in lexicon scorer.
+# It skips TextBlob's tagger but only knows these words, so its scores (and the
+# impact scores derived from them) differ from TextBlob's on real feedback
+_SENTIMENT_LEXICON = {
+    "amazing": 0.6, "awesome": 1.0, "best": 1.0, "better": 0.5, "easy": 0.43,
+    "excellent": 1.0, "fantastic": 0.4, "fast": 0.2, "great": 0.8, "good": 0.7,
+    "happy": 0.8, "helpful": 0.5, "impressive": 1.0, "love": 0.5, "nice": 0.6,
+    "noteworthy": 0.5, "perfect": 1.0, "quickly": 0.33, "useful": 0.3, "wonderful": 1.0,
+    "annoying": -0.8, "awful": -1.0, "bad": -0.7, "broken": -0.4, "confusing": -0.3,
+    "crash": -0.5, "difficult": -0.5, "disappointing": -0.6, "frustrating": -0.4, "hate": -0.8,
+    "poor": -0.4, "slow": -0.3, "terrible": -1.0, "useless": -0.5, "worse": -0.4,
+    "worst": -1.0
+}
+# Words that flip (and damp) the polarity of the next word, as TextBlob does
+_NEGATIONS = frozenset(["not", "never", "no", "don't", "doesn't", "isn't", "wasn't", "can't", "won't"])
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# Markup stripped from fetched web pages
+_HTML_TAG_RE = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+# Feedback that asks for a feature, matched against lowercased text (substring
+# match, so "needs" and "added" count)
+FEATURE_RE = re.compile(r"feature|request|add|implement|support|would like|want|need")
+# Keywords for the simple sentiment classifier (lowercased text). Matches start at a word boundary
+# but may run on, so "issues" and "crashing" count while "tissue" doesn't
+POS_RE = re.compile(r"\b(?:great|awesome|love|amazing|excellent|good|perfect|wonderful|impressive|fantastic)")
+NEG_RE = re.compile(r"\b(?:bad|terrible|awful|hate|disappointing|poor|crash|bug|issue|problem|frustrating|broken)")
+# "<number>. <label>" lines in a batch classification response
+_BATCH_LABEL_RE = re.compile(r"^\s*(\d+)[.):]\s*(positive|negative|neutral)\b", re.IGNORECASE | re.MULTILINE)
+
+def _lexicon_polarity(text_lower: str) -> float:
+    """Average polarity of the lexicon words in lowercased text (0.0 if none)"""
+    total = 0.0
+    matched = 0
+    negate = False
+    for word in _WORD_RE.findall(text_lower):
+        if word in _NEGATIONS:
+            negate = True
+            continue
+        score = _SENTIMENT_LEXICON.get(word)
+        if score is not None:
+            total += score * -0.5 if negate else score
+            matched += 1
+        negate = False
+    return total / matched if matched else 0.0
+
+def _score_chunk(scorer: str, texts: List[str]) -> List[float]:
+    """Polarity of each text with the named scorer (module level so worker processes can run it)
+    
+    The lexicon scorer expects lowercased texts.
+    """
+    if scorer == 'textblob':
+        from textblob import TextBlob
+        return [TextBlob(text).sentiment.polarity if text else 0.0 for text in texts]
+    return [_lexicon_polarity(text) if text else 0.0 for text in texts]
+
+@dataclass(slots=True)
+class FeedbackItem:
+    """A single piece of feedback; source-specific fields (url, rating, ...) live in extra"""
+    source: str
+    user: str
+    text: str
+    timestamp: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+    sentiment: Optional[str] = None
+    sentiment_score: Optional[float] = None
+    impact_score: Optional[float] = None
+    # Lowercased text, computed once for the keyword and lexicon scans
+    text_lower: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.text_lower = self.text.lower()
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FeedbackItem':
+        """Build an item from the flat dict form (the inverse of to_dict)"""
+        extra = {k: v for k, v in data.items() if k not in _FEEDBACK_ITEM_FIELDS}
+        return cls(
+            source=data.get('source', 'unknown'),
+            user=data.get('user', 'unknown'),
+            text=data.get('text', ''),
+            timestamp=data.get('timestamp'),
+            extra=extra,
+            sentiment=data.get('sentiment'),
+            sentiment_score=data.get('sentiment_score'),
+            impact_score=data.get('impact_score')
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Flatten into the plain dict form used for JSON output"""
+        data = {'source': self.source, 'user': self.user, 'text': self.text, 'timestamp': self.timestamp}
+        data.update(self.extra)
+        for name in ('sentiment', 'sentiment_score', 'impact_score'):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+# Keys of the flat dict form that map to FeedbackItem fields rather than extra
+_FEEDBACK_ITEM_FIELDS = frozenset(['source', 'user', 'text', 'timestamp', 'sentiment', 'sentiment_score', 'impact_score'])
+
+def _as_items(feedback_items: List[Union[FeedbackItem, Dict[str, Any]]]) -> List[FeedbackItem]:
+    """Accept feedback as FeedbackItems or as the dicts returned by earlier results"""
+    return [item if isinstance(item, FeedbackItem) else FeedbackItem.from_dict(item) for item in feedback_items]
 
 class FeedbackMonitor:
     """Tool to monitor and aggregate feedback from multiple sources"""
     
-    def __init__(self):
+    def __init__(self, use_lexicon: Optional[bool] = None, use_llm: Optional[bool] = None):
+        if use_lexicon is None:
+            use_lexicon = os.getenv('SENTIMENT_USE_LEXICON', 'false').lower() in ('1', 'true', 'yes')
+        self.use_lexicon = use_lexicon
+        if use_llm is None:
+            use_llm = os.getenv('SENTIMENT_USE_LLM', 'false').lower() in ('1', 'true', 'yes')
+        self.use_llm = use_llm
+        self.sentiment_cache = SentimentCache()
         self.config = get_config()
         self.logger = logging.getLogger(__name__)
         self.slack_integration = SlackIntegration()
     
-    def gather_feedback(self) -> List[Dict[str, Any]]:
+    def gather_feedback(self) -> List[FeedbackItem]:
         """Gather feedback from all available sources"""
         self.logger.info("Gathering feedback from all sources...")
         
-        feedback_items = []
-        
-        # Gather feedback from Slack
-        slack_feedback = self.gather_slack_feedback()
-        feedback_items.extend(slack_feedback)
-        
-        # Gather feedback from web sources
-        web_feedback = self.gather_web_feedback()
-        feedback_items.extend(web_feedback)
-        
-        # Gather feedback from social media (simulated)
-        social_media_feedback = self.gather_social_media_feedback()
-        feedback_items.extend(social_media_feedback)
+        # Slack, web, social media and email sources are independent; fetch them
+        # concurrently so the total wait is the slowest source, not the sum
+        gatherers = [
+            self.gather_slack_feedback,
+            self.gather_web_feedback,
+            self.gather_social_media_feedback,
+            self.gather_email_feedback
+        ]
         
-        # Gather feedback from email (simulated)
-        email_feedback = self.gather_email_feedback()
-        feedback_items.extend(email_feedback)
+        feedback_items = []
+        with ThreadPoolExecutor(max_workers=len(gatherers)) as executor:
+            futures = [executor.submit(gatherer) for gatherer in gatherers]
+            for gatherer, future in zip(gatherers, futures):
+                try:
+                    feedback_items.extend(future.result())
+                except Exception as e:
+                    self.logger.error(f"Error in {gatherer.__name__}: {str(e)}")
         
         self.logger.info(f"Gathered {len(feedback_items)} feedback items total")
         return feedback_items
     
-    def gather_slack_feedback(self, channel_name: str = "feedback-and-issues") -> List[Dict[str, Any]]:
-        """Gather feedback from Slack channel"""
-        self.logger.info(f"Gathering feedback from Slack channel: {channel_name}")
+    def gather_slack_feedback(self, channels: Union[str, List[str]] = "feedback-and-issues", incremental: bool = True) -> List[FeedbackItem]:
+        """Gather feedback from one or more Slack channels (fetched concurrently)
+        
+        With incremental=True (the default), repeated calls only return messages
+        posted since the previous call, so re-polling doesn't re-analyze old feedback.
+        """
+        if isinstance(channels, str):
+            channels = [channels]
+        self.logger.info(f"Gathering feedback from Slack channels: {', '.join(channels)}")
         
-        messages = self.slack_integration.get_channel_messages(channel_name)
+        messages_by_channel = self.slack_integration.get_all_feedback(channels, incremental=incremental)
         
         feedback_items = []
-        for message in messages:
-            feedback_item = {
-                'source': 'slack',
-                'channel': channel_name,
-                'user': message.get('user', 'unknown'),
-                'text': message.get('text', ''),
-                'timestamp': message.get('timestamp'),
-                'raw_message': message
-            }
-            feedback_items.append(feedback_item)
+        for channel_name, messages in messages_by_channel.items():
+            for message in messages:
+                feedback_item = FeedbackItem(
+                    source='slack',
+                    # User IDs repeat across messages; share one string per user
+                    user=sys.intern(message.get('user', 'unknown')),
+                    text=message.get('text', ''),
+                    timestamp=message.get('timestamp'),
+                    extra={'channel': channel_name, 'raw_message': message}
+                )
+                feedback_items.append(feedback_item)
         
         self.logger.info(f"Found {len(feedback_items)} feedback messages in Slack")
         return feedback_items
     
-    def gather_web_feedback(self) -> List[Dict[str, Any]]:
-        """Gather feedback from web sources (simulated for now)"""
+    def gather_web_feedback(self, urls: Optional[List[str]] = None) -> List[FeedbackItem]:
+        """Gather feedback from web sources (simulated, plus any given pages fetched concurrently)"""
         self.logger.info("Gathering feedback from web sources...")
         
         # Simulated web feedback - in a real implementation, this would scrape
         # forums, review sites, or use web APIs
+        now = datetime.now().isoformat()
         web_feedback = [
-            {
-                'source': 'web_forum',
-                'user': 'forum_user_123',
-                'text': 'The new analytics dashboard is great but needs more export options',
-                'timestamp': datetime.now().isoformat(),
-                'url': 'https://example.com/forum/thread/123'
-            },
-            {
-                'source': 'review_site',
-                'user': 'reviewer_456',
-                'text': 'Love the product! Would be perfect with better mobile support',
-                'timestamp': datetime.now().isoformat(),
-                'rating': 4.5
-            }
+            FeedbackItem(
+                source='web_forum',
+                user='forum_user_123',
+                text='The new analytics dashboard is great but needs more export options',
+                timestamp=now,
+                extra={'url': 'https://example.com/forum/thread/123'}
+            ),
+            FeedbackItem(
+                source='review_site',
+                user='reviewer_456',
+                text='Love the product! Would be perfect with better mobile support',
+                timestamp=now,
+                extra={'rating': 4.5}
+            )
         ]
         
+        if urls:
+            web_feedback.extend(self._fetch_web_feedback(urls))
+        
         self.logger.info(f"Found {len(web_feedback)} feedback items from web sources")
         return web_feedback
     
-    def gather_social_media_feedback(self) -> List[Dict[str, Any]]:
+    def _fetch_web_feedback(self, urls: List[str]) -> List[FeedbackItem]:
+        """Fetch feedback pages concurrently over the shared keep-alive connection pool"""
+        with ThreadPoolExecutor(max_workers=min(WEB_MAX_WORKERS, len(urls))) as executor:
+            pages = list(executor.map(self._fetch_web_page, urls))
+        
+        now = datetime.now().isoformat()
+        return [
+            FeedbackItem(source='web', user=sys.intern(urlparse(url).netloc), text=text, timestamp=now, extra={'url': url})
+            for url, text in zip(urls, pages)
+            if text
+        ]
+    
+    def _fetch_web_page(self, url: str) -> Optional[str]:
+        """Fetch a page and return its visible text, or None on error"""
+        try:
+            response = shared_session.get(url, timeout=10)
+            response.raise_for_status()
+            return ' '.join(html.unescape(_HTML_TAG_RE.sub(' ', response.text)).split())
+        except Exception as e:
+            self.logger.error(f"Error fetching web feedback from {url}: {str(e)}")
+            return None
+    
+    def gather_social_media_feedback(self) -> List[FeedbackItem]:
         """Gather feedback from social media platforms (simulated)"""
         self.logger.info("Gathering feedback from social media...")
         
         # Simulated social media feedback
+        now = datetime.now().isoformat()
         social_feedback = [
-            {
-                'source': 'twitter',
-                'user': '@tech_enthusiast',
-                'text': 'Just tried the new feature - amazing work team! #innovation',
-                'timestamp': datetime.now().isoformat(),
-                'likes': 23,
-                'retweets': 5
-            },
-            {
-                'source': 'linkedin',
-                'user': 'Industry Professional',
-                'text': 'Impressive update to the platform. The UI improvements are particularly noteworthy.',
-                'timestamp': datetime.now().isoformat(),
-                'reactions': 15
-            }
+            FeedbackItem(
+                source='twitter',
+                user='@tech_enthusiast',
+                text='Just tried the new feature - amazing work team! #innovation',
+                timestamp=now,
+                extra={'likes': 23, 'retweets': 5}
+            ),
+            FeedbackItem(
+                source='linkedin',
+                user='Industry Professional',
+                text='Impressive update to the platform. The UI improvements are particularly noteworthy.',
+                timestamp=now,
+                extra={'reactions': 15}
+            )
         ]
         
         self.logger.info(f"Found {len(social_feedback)} feedback items from social media")
         return social_feedback
     
-    def gather_email_feedback(self) -> List[Dict[str, Any]]:
+    def gather_email_feedback(self) -> List[FeedbackItem]:
         """Gather feedback from email (simulated)"""
         self.logger.info("Gathering feedback from email...")
         
         # Simulated email feedback
+        now = datetime.now().isoformat()
         email_feedback = [
-            {
-                'source': 'email',
-                'user': 'customer@example.com',
-                'text': 'The support team was very helpful in resolving my issue quickly.',
-                'timestamp': datetime.now().isoformat(),
-                'subject': 'Great support experience'
-            },
-            {
-                'source': 'email',
-                'user': 'user@company.com',
-                'text': 'We need better integration with our existing CRM system.',
-                'timestamp': datetime.now().isoformat(),
-                'subject': 'Feature request: CRM integration'
-            }
+            FeedbackItem(
+                source='email',
+                user='customer@example.com',
+                text='The support team was very helpful in resolving my issue quickly.',
+                timestamp=now,
+                extra={'subject': 'Great support experience'}
+            ),
+            FeedbackItem(
+                source='email',
+                user='user@company.com',
+                text='We need better integration with our existing CRM system.',
+                timestamp=now,
+                extra={'subject': 'Feature request: CRM integration'}
+            )
         ]
         
         self.logger.info(f"Found {len(email_feedback)} feedback items from email")
         return email_feedback
     
-    def analyze_sentiment(self, feedback_items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Perform sentiment analysis on feedback items using TextBlob"""
-        self.logger.info("Analyzing sentiment of feedback items using TextBlob...")
-        
-        try:
-            from textblob import TextBlob
-        except ImportError:
-            self.logger.warning("TextBlob not available, falling back to simple sentiment analysis")
-            return self._simple_sentiment_analysis(feedback_items)
+    def analyze_sentiment(self, feedback_items: List[Union[FeedbackItem, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Perform sentiment analysis on feedback items using TextBlob (or the lexicon/LLM if enabled)
+        
+        FeedbackItems get their sentiment fields set in place; the returned
+        feedback_items are plain dicts, ready for JSON output.
+        """
+        feedback_items = _as_items(feedback_items)
+        if self.use_llm:
+            return self._llm_sentiment_analysis(feedback_items)
+        
+        if self.use_lexicon:
+            self.logger.info("Analyzing sentiment of feedback items using the sentiment lexicon...")
+            scorer = 'lexicon'
+        else:
+            self.logger.info("Analyzing sentiment of feedback items using TextBlob...")
+            try:
+                import textblob  # noqa: F401 - only checking that it's installed
+            except ImportError:
+                self.logger.warning("TextBlob not available, falling back to simple sentiment analysis")
+                return self._simple_sentiment_analysis(feedback_items)
+            scorer = 'textblob'
+        
+        # Score all texts in one batch; empty texts are neutral and not averaged
+        texts = [item.text_lower if scorer == 'lexicon' else item.text for item in feedback_items]
+        if scorer == 'textblob':
+            polarities = self._cached_textblob_scores(feedback_items, texts)
+        else:
+            # Lexicon lookups are cheaper than hashing each item for the cache
+            polarities = self._score_texts(scorer, texts)
         
         sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0}
-        sentiment_scores = []
-        
-        for item in feedback_items:
-            text = item.get('text', '')
-            if not text:
-                item['sentiment'] = 'neutral'
-                sentiment_counts['neutral'] += 1
-                item['sentiment_score'] = 0.0
-                continue
-                
-            # Analyze sentiment using TextBlob
-            blob = TextBlob(text)
-            polarity = blob.sentiment.polarity
-            item['sentiment_score'] = polarity
-            
+        total_score = 0.0
+        scored = 0
+        
+        for item, text, polarity in zip(feedback_items, texts, polarities):
             # Classify sentiment based on polarity score
-            if polarity > 0.1:
-                sentiment = "positive"
-            elif polarity < -0.1:
-                sentiment = "negative"
-            else:
-                sentiment = "neutral"
-                
-            item['sentiment'] = sentiment
+            sentiment = _SENTIMENT_LABELS[(polarity > 0.1) - (polarity < -0.1)]
+            item.sentiment = sentiment
+            item.sentiment_score = polarity
             sentiment_counts[sentiment] += 1
-            sentiment_scores.append(polarity)
+            if text:
+                total_score += polarity
+                scored += 1
         
         # Calculate average sentiment score
-        avg_sentiment = sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else 0
+        avg_sentiment = total_score / scored if scored else 0
         
         return {
             "total_feedback": len(feedback_items),
             "sentiment_distribution": sentiment_counts,
             "overall_sentiment": self._calculate_overall_sentiment(sentiment_counts),
             "average_sentiment_score": round(avg_sentiment, 3),
-            "feedback_items": feedback_items
+            "feedback_items": [item.to_dict() for item in feedback_items]
         }
     
-    def _simple_sentiment_analysis(self, feedback_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _cached_textblob_scores(self, feedback_items: List[FeedbackItem], texts: List[str]) -> List[float]:
+        """TextBlob polarity of each text, reusing scores of items seen in earlier runs"""
+        keys = [SentimentCache.make_key('textblob', item.source, item.user, item.text) for item in feedback_items]
+        polarities = [self.sentiment_cache.get(key) for key in keys]
+        missing = [i for i, polarity in enumerate(polarities) if polarity is None]
+        for i, polarity in zip(missing, self._score_texts('textblob', [texts[i] for i in missing])):
+            polarities[i] = polarity
+            self.sentiment_cache.set(keys[i], polarity)
+        self.sentiment_cache.save()
+        return polarities
+    
+    def _score_texts(self, scorer: str, texts: List[str]) -> List[float]:
+        """Polarity of each text; large TextBlob batches are spread over worker processes"""
+        if scorer != 'textblob' or len(texts) < SENTIMENT_PROCESS_MIN_ITEMS:
+            return _score_chunk(scorer, texts)
+        
+        chunks = [texts[i:i + SENTIMENT_PROCESS_CHUNK_SIZE] for i in range(0, len(texts), SENTIMENT_PROCESS_CHUNK_SIZE)]
+        with ProcessPoolExecutor() as executor:
+            return list(chain.from_iterable(executor.map(_score_chunk, repeat(scorer), chunks)))
+    
+    def _simple_sentiment_analysis(self, feedback_items: List[FeedbackItem]) -> Dict[str, Any]:
         """Fallback simple sentiment analysis"""
         self.logger.info("Using simple sentiment analysis...")
         
+        labels = [self._classify_sentiment_simple(item.text_lower) for item in feedback_items]
+        return self._label_sentiment_analysis(feedback_items, labels)
+    
+    def _llm_sentiment_analysis(self, feedback_items: List[FeedbackItem]) -> Dict[str, Any]:
+        """Sentiment analysis with batched LLM classification"""
+        self.logger.info("Analyzing sentiment of feedback items using the LLM...")
+        
+        labels = self.classify_batch([item.text for item in feedback_items])
+        return self._label_sentiment_analysis(feedback_items, labels)
+    
+    def _label_sentiment_analysis(self, feedback_items: List[FeedbackItem], labels: List[str]) -> Dict[str, Any]:
+        """Summarize sentiment from per-item labels (scores are +1/-1/0)"""
         sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0}
         
-        for item in feedback_items:
-            text = item.get('text', '').lower()
-            sentiment = self._classify_sentiment_simple(text)
-            item['sentiment'] = sentiment
+        for item, sentiment in zip(feedback_items, labels):
+            item.sentiment = sentiment
             sentiment_counts[sentiment] += 1
-            item['sentiment_score'] = 1.0 if sentiment == 'positive' else -1.0 if sentiment == 'negative' else 0.0
+            item.sentiment_score = 1.0 if sentiment == 'positive' else -1.0 if sentiment == 'negative' else 0.0
         
         return {
             "total_feedback": len(feedback_items),
             "sentiment_distribution": sentiment_counts,
             "overall_sentiment": self._calculate_overall_sentiment(sentiment_counts),
             "average_sentiment_score": 0.0,  # Not calculated in simple mode
-            "feedback_items": feedback_items
+            "feedback_items": [item.to_dict() for item in feedback_items]
         }
     
-    def _classify_sentiment_simple(self, text: str) -> str:
-        """Simple sentiment classification based on keywords"""
-        positive_words = ['great', 'awesome', 'love', 'amazing', 'excellent', 'good', 'perfect', 'wonderful', 'impressive', 'fantastic']
-        negative_words = ['bad', 'terrible', 'awful', 'hate', 'disappointing', 'poor', 'crash', 'bug', 'issue', 'problem', 'frustrating', 'broken']
-        
-        text_lower = text.lower()
+    def classify_batch(self, texts: List[str], batch_size: int = SENTIMENT_BATCH_SIZE) -> List[str]:
+        """Classify texts as positive/negative/neutral with one LLM request per batch
+        
+        Items the LLM doesn't answer for fall back to the keyword classifier.
+        """
+        labels = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            numbered = "\n".join(f"{i + 1}. {' '.join(text.split())}" for i, text in enumerate(batch))
+            prompt = (
+                "Classify the sentiment of each numbered feedback item as positive, negative or neutral.\n"
+                "Answer with one line per item in the form '<number>. <label>' and nothing else.\n\n"
+                f"{numbered}"
+            )
+            
+            response = self._complete(prompt)
+            answered = {int(number): label.lower() for number, label in _BATCH_LABEL_RE.findall(response)}
+            labels.extend(
+                answered.get(i + 1) or self._classify_sentiment_simple(text.lower())
+                for i, text in enumerate(batch)
+            )
+        return labels
+    
+    def _complete(self, prompt: str) -> str:
+        """Send a prompt to the configured Gemini model and return the response text"""
+        llm = self.config.llm
+        if not llm.api_key:
+            self.logger.warning("GOOGLE_API_KEY not set, skipping LLM request")
+            return ""
         
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        try:
+            response = shared_session.post(
+                GEMINI_API_URL.format(model=llm.model.split('/')[-1]),
+                headers={"x-goog-api-key": llm.api_key},
+                json={
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {"temperature": llm.temperature}
+                },
+                timeout=60
+            )
+            response.raise_for_status()
+            parts = response.json()["candidates"][0]["content"]["parts"]
+            return "".join(part.get("text", "") for part in parts)
+        except Exception as e:
+            self.logger.error(f"Error calling LLM: {str(e)}")
+            return ""
+    
+    def _classify_sentiment_simple(self, text_lower: str) -> str:
+        """Simple sentiment classification based on keywords in lowercased text"""
+        positive_count = len(POS_RE.findall(text_lower))
+        negative_count = len(NEG_RE.findall(text_lower))
         
         if positive_count > negative_count:
             return "positive"
@@ -232,34 +484,28 @@ class FeedbackMonitor:
         else:
             return "neutral"
     
-    def calculate_impact_score(self, feedback_item: Dict[str, Any]) -> float:
+    def calculate_impact_score(self, feedback_item: FeedbackItem) -> float:
         """Calculate impact score for a feedback item"""
         # Simple impact scoring based on sentiment and text length
-        sentiment_weights = {"positive": 0.3, "negative": 0.7, "neutral": 0.1}
-        
-        sentiment = feedback_item.get('sentiment', 'neutral')
-        text_length = len(feedback_item.get('text', ''))
-        
-        sentiment_score = sentiment_weights.get(sentiment, 0.1)
-        length_score = min(text_length / 100, 1.0)  # Normalize text length
+        sentiment_score = _IMPACT_SENTIMENT_WEIGHTS.get(feedback_item.sentiment, 0.1)
+        length_score = min(len(feedback_item.text) / 100, 1.0)  # Normalize text length
         
         return (sentiment_score * 0.7) + (length_score * 0.3)
     
-    def get_feature_requests(self, feedback_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Extract feature requests from feedback"""
-        feature_keywords = ['feature', 'request', 'add', 'implement', 'support', 'would like', 'want', 'need']
-        
+    def get_feature_requests(self, feedback_items: List[Union[FeedbackItem, Dict[str, Any]]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Extract feature requests from feedback as dicts, highest impact first (only the top_k if given)"""
         feature_requests = []
-        for item in feedback_items:
-            text = item.get('text', '').lower()
-            if any(keyword in text for keyword in feature_keywords):
-                # Calculate impact score for prioritization
-                impact_score = self.calculate_impact_score(item)
-                feature_request = item.copy()
-                feature_request['impact_score'] = impact_score
-                feature_requests.append(feature_request)
+        for item in _as_items(feedback_items):
+            if FEATURE_RE.search(item.text_lower):
+                # Calculate impact score for prioritization (set on the item itself,
+                # like the sentiment fields, rather than on a copy)
+                item.impact_score = self.calculate_impact_score(item)
+                feature_requests.append(item)
         
         # Sort by impact score (highest first)
-        feature_requests.sort(key=lambda x: x.get('impact_score', 0), reverse=True)
+        if top_k is not None:
+            feature_requests = heapq.nlargest(top_k, feature_requests, key=attrgetter('impact_score'))
+        else:
+            feature_requests.sort(key=attrgetter('impact_score'), reverse=True)
         
-        return feature_requests
+        return [item.to_dict() for item in feature_requests]
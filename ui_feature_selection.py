@@ -5,15 +5,33 @@ Integrates with Portia SDK for actual workflow execution
 """
 
 import os
+import re
 import sys
 import json
 import logging
-from dotenv import load_dotenv
 from pm_agent_workflow import PMAgentWorkflow  # Import the new workflow controller
 
+# Use orjson's C parser for the analysis file when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Known feature themes and their display titles (in priority order)
+_TITLE_RE = re.compile(
+    r"(?P<slack>Slack integration|Slack Notifications)"
+    r"|(?P<excel>Excel plugin|Excel integration)"
+    r"|(?P<batch>processing limits|batch)"
+)
+_TITLES = {
+    'slack': "Real-time Slack Notifications",
+    'excel': "Native Excel Integration",
+    'batch': "Increased Processing Limits"
+}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -29,10 +47,14 @@ class FeatureSelectionUI:
     def load_features_from_analysis(self, analysis_file='feedback_analysis.json'):
         """Load features from feedback analysis file"""
         try:
-            with open(analysis_file, 'r') as f:
-                data = json.load(f)
+            with open(analysis_file, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
             
             self.features = data.get('feature_requests', [])
+            # Titles are shown on every redisplay; work them out once here
+            for feature in self.features:
+                feature['_title'] = self._extract_feature_title(feature.get('text', ''))
             logger.info(f"Loaded {len(self.features)} feature requests from analysis")
             return True
         except FileNotFoundError:
@@ -53,21 +75,23 @@ class FeatureSelectionUI:
         logger.info("="*60)
         
         for i, feature in enumerate(self.features):
-            title = self._extract_feature_title(feature.get('text', ''))
+            title = self._feature_title(feature)
             impact_score = feature.get('impact_score', 0)
             logger.info(f"{i + 1}. {title} (Impact Score: {impact_score:.2f})")
             logger.info(f"   Source: {feature.get('source', 'Unknown')}")
             logger.info(f"   User: {feature.get('user', 'Unknown')}")
             logger.info("")
     
+    def _feature_title(self, feature):
+        """Title of a feature, precomputed at load time when available"""
+        return feature.get('_title') or self._extract_feature_title(feature.get('text', ''))
+    
     def _extract_feature_title(self, text):
         """Extract meaningful title from feature text"""
-        if "Slack integration" in text or "Slack Notifications" in text:
-            return "Real-time Slack Notifications"
-        elif "Excel plugin" in text or "Excel integration" in text:
-            return "Native Excel Integration"
-        elif "processing limits" in text or "batch" in text:
-            return "Increased Processing Limits"
+        # Several themes can appear; the highest priority one wins, not the first in the text
+        found = {match.lastgroup for match in _TITLE_RE.finditer(text)}
+        if found:
+            return next(title for theme, title in _TITLES.items() if theme in found)
         else:
             # Extract first line or meaningful snippet
             lines = text.split('\n')
@@ -94,7 +118,7 @@ class FeatureSelectionUI:
             feature_index = int(choice) - 1
             if 0 <= feature_index < len(self.features):
                 self.selected_feature = self.features[feature_index]
-                title = self._extract_feature_title(self.selected_feature.get('text', ''))
+                title = self._feature_title(self.selected_feature)
                 logger.info(f"✅ Selected: {title}")
                 return self.selected_feature
             else:
@@ -107,7 +131,7 @@ class FeatureSelectionUI:
     
     def continue_workflow_with_portia(self, selected_feature):
         """Continue workflow using Portia SDK with the selected feature"""
-        title = self._extract_feature_title(selected_feature.get('text', ''))
+        title = self._feature_title(selected_feature)
         logger.info(f"🚀 Continuing workflow with Portia SDK for: {title}")
         
         # Create a prompt for Portia based on the selected feature
@@ -130,7 +154,8 @@ class FeatureSelectionUI:
         """
         
         # Use the workflow controller to generate and execute the plan
-        self.workflow.run_workflow(feature_prompt)
+        # Plans are only reused for a similar feature, not for the shared prompt wording
+        self.workflow.run_workflow(feature_prompt, template_key=f"{title}\n{selected_feature.get('text', '')}")
         
         return {
             'title': title,
@@ -143,7 +168,6 @@ class FeatureSelectionUI:
 def main():
     """Main function to run the feature selection UI"""
     logger.info("Starting PM Agentic AI Feature Selection UI...")
-    load_dotenv()
     
     ui = FeatureSelectionUI()
     
@@ -161,4 +185,6 @@ def main():
         logger.info("No feature selected. Workflow terminated.")
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     main()